@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#Copyright (C) 2012-2013, Kushal Das <kushaldas@gmail.com>
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of
+#this software and associated documentation files (the "Software"), to deal in
+#the Software without restriction, including without limitation the rights to
+#use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+#of the Software, and to permit persons to whom the Software is furnished to do
+#so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+
+"""
+Dispatch microbenchmark, the isinstance chain ``get_rst`` used to run for
+every child against the renderer registry.
+
+Run it from the top of the source tree::
+
+    python benchmarks/bench_dispatch.py --size 1000000
+
+Only finding the renderer of every node is timed, not rendering it. The
+nodes are a mix of all node types, and every type is timed on its own
+too, the chain is slowest for the types at its end.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rst
+
+
+def make_nodes(size):
+    kinds = [
+        lambda: rst.Paragraph('Paragraph'),
+        lambda: rst.Section('Section', 2),
+        lambda: rst.Bulletlist(),
+        lambda: rst.Orderedlist(),
+        lambda: rst.Table('Table', ['Name']),
+        lambda: rst.CodeBlock('pass'),
+    ]
+    return [kinds[i % len(kinds)]() for i in range(size)]
+
+
+def chain_dispatch(nodes):
+    # the order of the checks of the old get_rst
+    for child in nodes:
+        if isinstance(child, rst.Paragraph):
+            renderer = rst.Paragraph.render
+        elif isinstance(child, rst.Section):
+            renderer = rst.Section.render
+        elif isinstance(child, rst.Bulletlist):
+            renderer = rst.Bulletlist.render
+        elif isinstance(child, rst.Orderedlist):
+            renderer = rst.Orderedlist.render
+        elif isinstance(child, rst.Table):
+            renderer = rst.Table.render
+        elif isinstance(child, rst.CodeBlock):
+            renderer = rst.CodeBlock.render
+        else:
+            renderer = None
+
+
+def registry_dispatch(nodes):
+    # the lookup of render_child
+    cache = rst.rst._RENDERER_CACHE
+    for child in nodes:
+        try:
+            renderer = cache[type(child)]
+        except KeyError:
+            renderer = rst.get_renderer(type(child))
+
+
+def per_node(func, nodes, repeat):
+    seconds = min(timeit.repeat(lambda: func(nodes), number=1, repeat=repeat))
+    return seconds / len(nodes) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    nodes = make_nodes(args.size)
+    print('%-12s %12s %12s' % ('nodes', 'chain', 'registry'))
+    groups = [('mixed', nodes)]
+    for kind in (rst.Paragraph, rst.Section, rst.Bulletlist,
+                 rst.Orderedlist, rst.Table, rst.CodeBlock):
+        groups.append((kind.__name__,
+                       [node for node in nodes if type(node) is kind]))
+    for name, group in groups:
+        print('%-12s %9.1f ns %9.1f ns' % (
+            name, per_node(chain_dispatch, group, args.repeat),
+            per_node(registry_dispatch, group, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#Copyright (C) 2012-2013, Kushal Das <kushaldas@gmail.com>
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of
+#this software and associated documentation files (the "Software"), to deal in
+#the Software without restriction, including without limitation the rights to
+#use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+#of the Software, and to permit persons to whom the Software is furnished to do
+#so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+
+"""
+HTML build time through ``Document.to_doctree`` against parsing the rst.
+
+Run it from the top of the source tree, it needs docutils::
+
+    python benchmarks/bench_doctree.py --sections 200
+
+The document has ``sections`` sections, each one holding a paragraph, a
+bullet list, an ordered list and a table. Both ways go from the
+``Document`` to the HTML page: ``publish_string(doc.get_rst())`` and
+``publish_from_doctree(doc.to_doctree())``, with the same HTML writer.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+from docutils.core import publish_from_doctree, publish_string
+from docutils.writers import get_writer_class
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rst
+
+
+def make_document(sections):
+    doc = rst.Document('HTML report')
+    for i in range(sections):
+        sec = rst.Section('Section %d' % i, 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Paragraph('Paragraph number %d of the benchmark.' % i))
+        sec.add_child(rst.Bulletlist(['Item %d' % j for j in range(5)]))
+        sec.add_child(rst.Orderedlist(['Step %d' % j for j in range(5)]))
+        tbl = rst.Table('Inventory', ['Name', 'Count', 'Place'])
+        tbl.add_rows(('item%d' % j, str(j), 'shelf %d' % j) for j in range(10))
+        sec.add_child(tbl)
+    return doc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sections', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    doc = make_document(args.sections)
+    writer = get_writer_class('html')
+
+    def from_rst():
+        return publish_string(doc.get_rst(), writer=writer())
+
+    def from_doctree():
+        return publish_from_doctree(doc.to_doctree(), writer=writer())
+
+    results = {}
+    for name, func in (('publish_string', from_rst),
+                       ('to_doctree', from_doctree)):
+        seconds = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        results[name] = seconds
+        print('%-16s %6d sections %8.3fs' % (name, args.sections, seconds))
+    print('speedup %.1fx' % (results['publish_string'] / results['to_doctree']))
+    if from_rst() != from_doctree():
+        print('warning: the HTML pages differ')
+
+
+if __name__ == '__main__':
+    main()
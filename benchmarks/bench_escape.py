@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#Copyright (C) 2012-2013, Kushal Das <kushaldas@gmail.com>
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of
+#this software and associated documentation files (the "Software"), to deal in
+#the Software without restriction, including without limitation the rights to
+#use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+#of the Software, and to permit persons to whom the Software is furnished to do
+#so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+
+"""
+Speed of ``rst.escape_text`` against naive per character escaping.
+
+Run it from the top of the source tree::
+
+    python benchmarks/bench_escape.py --megabytes 100
+
+The text is made of short lines, like paragraphs and table cells, a few
+of them holding characters which need escaping. Both functions are run
+once over every line and must give the same result.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rst
+
+
+LINES = [
+    'A plain line of text without any markup in it.',
+    'Another line, with numbers 1234567890 and dots.',
+    'Some *emphasis* and a `literal` here.',
+    '.. not a directive |substitution| and a back\\slash',
+]
+
+
+def naive_escape(text):
+    chars = []
+    for i, char in enumerate(text):
+        if char in '\\*`|':
+            chars.append('\\')
+        elif (char == '.' and text.startswith('..', i) and
+              (i == 0 or text[i - 1].isspace())):
+            chars.append('\\')
+        chars.append(char)
+    return ''.join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--megabytes', type=float, default=100)
+    args = parser.parse_args()
+    # three quarters of the lines need no escaping
+    sample = LINES[:2] * 3 + LINES[2:]
+    size = sum(len(line) for line in sample)
+    lines = sample * int(args.megabytes * 1e6 / size)
+    total = sum(len(line) for line in lines) / 1e6
+
+    def run(func):
+        return [func(line) for line in lines]
+
+    for name, func in (('escape_text', rst.escape_text),
+                       ('naive', naive_escape)):
+        start = timeit.default_timer()
+        result = run(func)
+        seconds = timeit.default_timer() - start
+        print('%-12s %8.1f MB %8.2fs %8.1f MB/s' % (
+            name, total, seconds, total / seconds))
+        if name == 'escape_text':
+            expected = result
+        elif result != expected:
+            raise AssertionError('The results differ')
+
+
+if __name__ == '__main__':
+    main()
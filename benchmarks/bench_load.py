@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#Copyright (C) 2012-2013, Kushal Das <kushaldas@gmail.com>
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of
+#this software and associated documentation files (the "Software"), to deal in
+#the Software without restriction, including without limitation the rights to
+#use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+#of the Software, and to permit persons to whom the Software is furnished to do
+#so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+
+"""
+Speed and memory of reading documents back with ``rst.iter_nodes``.
+
+Run it from the top of the source tree::
+
+    python benchmarks/bench_load.py --sections 100000
+
+A document of ``sections`` sections, each one holding a paragraph, a
+bullet list and a small table, is saved to a temporary file. The file is
+then streamed through ``iter_nodes``, reporting the speed and the peak
+memory ``tracemalloc`` sees, and loaded with ``Document.load``, checking
+that it is written back unchanged.
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rst
+
+
+def make_document(sections):
+    doc = rst.Document('Load')
+    for i in range(sections):
+        sec = rst.Section('Section %d' % i, 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Paragraph('Paragraph number %d with *markup*.' % i))
+        sec.add_child(rst.Bulletlist(['Item %d' % j for j in range(5)]))
+        tbl = rst.Table('Inventory', ['Name', 'Count'])
+        tbl.add_rows(('item%d' % j, str(j)) for j in range(5))
+        sec.add_child(tbl)
+    return doc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sections', type=int, default=100000)
+    args = parser.parse_args()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'load.rst')
+        make_document(args.sections).save(path)
+        size = os.path.getsize(path) / 1e6
+
+        with io.open(path, encoding='utf-8') as fobj:
+            start = timeit.default_timer()
+            count = sum(1 for node in rst.iter_nodes(fobj))
+            seconds = timeit.default_timer() - start
+        print('iter_nodes    %8.1f MB %9d nodes %8.2fs %8.1f MB/s' % (
+            size, count, seconds, size / seconds))
+
+        with io.open(path, encoding='utf-8') as fobj:
+            tracemalloc.start()
+            for node in rst.iter_nodes(fobj):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print('iter_nodes    %8.1f MB peak' % (peak / 1e6))
+
+        start = timeit.default_timer()
+        doc = rst.Document.load(path)
+        seconds = timeit.default_timer() - start
+        print('Document.load %8.1f MB %9d nodes %8.2fs %8.1f MB/s' % (
+            size, len(doc.children), seconds, size / seconds))
+        with io.open(path, encoding='utf-8') as fobj:
+            if doc.get_rst() != fobj.read():
+                raise AssertionError('The document is not written back unchanged')
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#Copyright (C) 2012-2013, Kushal Das <kushaldas@gmail.com>
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of
+#this software and associated documentation files (the "Software"), to deal in
+#the Software without restriction, including without limitation the rights to
+#use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+#of the Software, and to permit persons to whom the Software is furnished to do
+#so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+
+"""
+Memory used by the nodes of a document.
+
+Run it from the top of the source tree::
+
+    python benchmarks/bench_memory.py --count 1000000
+
+Every case builds ``count`` nodes of one type and reports the memory
+``tracemalloc`` sees for them, in bytes per node. The texts are built
+before the measurement starts, so only the nodes themselves are counted,
+except for the ``repeated`` cases which build a new copy of the same text
+for every node, as a generated changelog would.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rst
+
+
+def paragraphs(count, texts):
+    return [rst.Paragraph(text) for text in texts]
+
+
+def sections(count, texts):
+    return [rst.Section(text, 2) for text in texts]
+
+
+def codeblocks(count, texts):
+    return [rst.CodeBlock(text, lang='python') for text in texts]
+
+
+def repeated_paragraphs(count, texts):
+    return [rst.Paragraph(''.join(['Fixed a ', 'bug'])) for text in texts]
+
+
+def repeated_interned(count, texts):
+    return [rst.Paragraph(''.join(['Fixed a ', 'bug']), intern=True)
+            for text in texts]
+
+
+CASES = [
+    ('paragraph', paragraphs),
+    ('section', sections),
+    ('codeblock', codeblocks),
+    ('repeated', repeated_paragraphs),
+    ('repeated-interned', repeated_interned),
+]
+
+
+def measure(build, count):
+    texts = ['Text of node %d' % i for i in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    nodes = build(count, texts)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nodes
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--output', help='path of the JSON report')
+    args = parser.parse_args()
+    results = []
+    for name, build in CASES:
+        try:
+            used = measure(build, args.count)
+        except TypeError:
+            # the intern argument is missing in older versions
+            continue
+        results.append({'case': name, 'count': args.count, 'bytes': used,
+                        'bytes_per_node': used / float(args.count)})
+        print('%-18s %9d nodes %8.1f bytes/node' % (
+            name, args.count, used / float(args.count)))
+    if args.output:
+        with open(args.output, 'w') as fobj:
+            json.dump({'results': results}, fobj, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+#Copyright (C) 2012-2013, Kushal Das <kushaldas@gmail.com>
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of
+#this software and associated documentation files (the "Software"), to deal in
+#the Software without restriction, including without limitation the rights to
+#use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+#of the Software, and to permit persons to whom the Software is furnished to do
+#so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+
+"""
+Rendering benchmarks for every node type.
+
+Run it from the top of the source tree::
+
+    python benchmarks/bench_render.py --output before.json
+    python benchmarks/bench_render.py --output after.json
+    python benchmarks/bench_render.py --compare before.json after.json
+
+Parallel rendering is measured with ``--workers``, every case runs once
+for each number of worker processes. A 1 to 8 core scaling run of the
+report case, about 500 MB of rst at the largest size::
+
+    python benchmarks/bench_render.py --case report --sizes 100000 1000000 \
+        --workers 1 2 4 8 --output scaling.json
+
+Every case builds a synthetic document of one node type at several sizes
+and records the best wall time of ``get_rst``, the peak memory seen by
+``tracemalloc`` while rendering, the output size and the output bytes per
+second. The report is JSON so that runs of different commits can be
+compared.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rst
+
+
+def make_paragraphs(size):
+    doc = rst.Document('Paragraphs')
+    for i in range(size):
+        doc.add_child(rst.Paragraph('Paragraph number %d of the benchmark.' % i))
+    return doc
+
+
+def make_sections(size):
+    doc = rst.Document('Sections')
+    for i in range(size):
+        sec = rst.Section('Section %d' % i, 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Section('Parameters'))
+    return doc
+
+
+def make_bulletlist(size):
+    doc = rst.Document('Bullet list')
+    blt = rst.Bulletlist()
+    for i in range(size):
+        blt.add_item('Item number %d' % i)
+    doc.add_child(blt)
+    return doc
+
+
+def make_orderedlist(size):
+    doc = rst.Document('Ordered list')
+    blt = rst.Orderedlist()
+    for i in range(size):
+        blt.add_item('Item number %d' % i)
+    doc.add_child(blt)
+    return doc
+
+
+def make_table(size, format='list'):
+    doc = rst.Document('Table')
+    tbl = rst.Table('Inventory', ['Name', 'Count', 'Place', 'Owner'],
+                    format=format)
+    tbl.add_rows(('item%d' % i, str(i), 'shelf %d' % (i % 10), 'kushal')
+                 for i in range(size))
+    doc.add_child(tbl)
+    return doc
+
+
+def make_grid_table(size):
+    return make_table(size, 'grid')
+
+
+def make_simple_table(size):
+    return make_table(size, 'simple')
+
+
+def make_report(size):
+    # sections with a paragraph and a table of 100 rows, about 500 bytes
+    # of rst for every row
+    doc = rst.Document('Report')
+    text = 'Measurements of the benchmark run, ' * 12
+    for i in range(size // 100 or 1):
+        sec = rst.Section('Section %d' % i, 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Paragraph(text))
+        tbl = rst.Table('Run %d' % i, ['Name', 'Count', 'Place', 'Note'])
+        tbl.add_rows(('item%d' % j, str(j), 'shelf %d' % (j % 10), text)
+                     for j in range(100))
+        sec.add_child(tbl)
+    return doc
+
+
+def make_codeblocks(size):
+    doc = rst.Document('Code blocks')
+    code = '\n'.join('value_%d = compute(%d)' % (i, i) for i in range(20))
+    for i in range(size // 20 or 1):
+        doc.add_child(rst.CodeBlock(code, lang='python'))
+    return doc
+
+
+CASES = {
+    'paragraph': make_paragraphs,
+    'section': make_sections,
+    'bulletlist': make_bulletlist,
+    'orderedlist': make_orderedlist,
+    'table': make_table,
+    'grid-table': make_grid_table,
+    'simple-table': make_simple_table,
+    'codeblock': make_codeblocks,
+    'report': make_report,
+}
+
+
+def run_case(name, size, repeat, workers=1):
+    """
+    Returns the measurements of a single case as a dictionary.
+    """
+    doc = CASES[name](size)
+    render = lambda: doc.get_rst(workers)
+    gc.collect()
+    seconds = min(timeit.repeat(render, number=1, repeat=repeat))
+    # only the memory of this process is traced, not the one of workers
+    tracemalloc.start()
+    text = render()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size_bytes = len(text.encode('utf-8'))
+    return {
+        'case': name,
+        'size': size,
+        'workers': workers,
+        'seconds': seconds,
+        'peak_bytes': peak,
+        'output_bytes': size_bytes,
+        'bytes_per_second': size_bytes / seconds if seconds else None,
+    }
+
+
+def max_rss():
+    """
+    Returns the peak resident set size of the process in bytes.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run(cases, sizes, repeat, workers=(1,)):
+    results = []
+    for name in cases:
+        for size in sizes:
+            for count in workers:
+                result = run_case(name, size, repeat, count)
+                results.append(result)
+                print('%-12s %9d %2d %9.4fs %10.1f MB/s %9.1f MB peak' % (
+                    name, size, count, result['seconds'],
+                    (result['bytes_per_second'] or 0) / 1e6,
+                    result['peak_bytes'] / 1e6))
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'max_rss_bytes': max_rss(),
+        'results': results,
+    }
+
+
+def _key(result):
+    # reports written before --workers have no workers entry
+    return result['case'], result['size'], result.get('workers', 1)
+
+
+def compare(old_path, new_path):
+    with open(old_path) as fobj:
+        old = dict((_key(r), r) for r in json.load(fobj)['results'])
+    with open(new_path) as fobj:
+        new = json.load(fobj)['results']
+    print('%-12s %9s %2s %10s %10s %8s' % ('case', 'size', 'w', 'old', 'new',
+                                          'change'))
+    for result in new:
+        before = old.get(_key(result))
+        if before is None:
+            continue
+        change = (result['seconds'] - before['seconds']) / before['seconds']
+        print('%-12s %9d %2d %9.4fs %9.4fs %+7.1f%%' % (
+            result['case'], result['size'], result.get('workers', 1),
+            before['seconds'], result['seconds'], change * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--case', action='append', choices=sorted(CASES),
+                        help='case to run, all of them by default')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1],
+                        help='numbers of worker processes to render with')
+    parser.add_argument('--output', help='path of the JSON report')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two JSON reports')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = run(args.case or sorted(CASES), args.sizes, args.repeat,
+                 args.workers)
+    if args.output:
+        with open(args.output, 'w') as fobj:
+            json.dump(report, fobj, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -56,7 +56,7 @@ def main():
     tbl.add_item(('Nicubunu', 'Fedora'))
     doc.add_child(tbl)
 
-    print doc.get_rst()
+    print(doc.get_rst())
 
 if __name__ == '__main__':
     main()
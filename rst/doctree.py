@@ -0,0 +1,305 @@
+#Copyright (C) 2012-2013, Kushal Das <kushaldas@gmail.com>
+
+#Permission is hereby granted, free of charge, to any person obtaining a copy of
+#this software and associated documentation files (the "Software"), to deal in
+#the Software without restriction, including without limitation the rights to
+#use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+#of the Software, and to permit persons to whom the Software is furnished to do
+#so, subject to the following conditions:
+
+#The above copyright notice and this permission notice shall be included in all
+#copies or substantial portions of the Software.
+
+#THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#SOFTWARE.
+
+"""
+Builds docutils document trees straight from ``rst.Document`` objects,
+without writing the rst and parsing it again. It needs docutils.
+"""
+
+import io
+import itertools
+import re
+
+try:
+    from docutils import frontend, nodes, utils
+    from docutils.parsers.rst import Parser
+    from docutils.readers.standalone import Reader
+    from docutils.utils.code_analyzer import Lexer, LexerError, NumberLines
+except ImportError:
+    nodes = None
+
+from six import text_type
+
+from .rst import (Bulletlist, CodeBlock, Orderedlist, Paragraph, Section,
+                  Table, escape_text, get_renderer, render_child, walk,
+                  _new_buffer)
+
+
+# text which the rst parser turns into markup even when it is escaped:
+# references and targets, standalone URIs and e-mail addresses, and at
+# the start of a line indents, blank lines, list and option markers,
+# doctest blocks and lines of punctuation like section adornments
+_MARKUP_RE = re.compile(
+    r'_(?!\w)|:(?=\S)|@|(?:^|\n)(?:\s|[-+*\u2022\u2023\u2043](?=\s|$)|'
+    r'\(?(?:\d+|[#a-zA-Z]|[ivxlcdmIVXLCDM]+)[.)](?=\s|$)|-{1,2}\w|/\w|'
+    r'>>>|[!-/:-@\[-`{-~]+[ \t]*(?=\n|$))')
+
+
+def _plain(text):
+    """
+    Returns ``True`` if the escaped ``text`` is parsed back to the text
+    alone. Texts which may hold markup are parsed instead.
+    """
+    return _MARKUP_RE.search(text) is None
+
+
+def _default_settings():
+    """
+    Returns the default settings of the rst parser and reader.
+    """
+    if hasattr(frontend, 'get_default_settings'):
+        return frontend.get_default_settings(Parser, Reader)
+    return frontend.OptionParser(
+        components=(Parser, Reader)).get_default_values()
+
+
+class _Builder(object):
+    """
+    Adds the nodes of a document to a docutils document, the way the rst
+    parser would add the rst of the nodes.
+    """
+    def __init__(self, title, escape, settings):
+        self.document = utils.new_document('<string>', settings)
+        self.parser = None
+        self.quote = None
+        self.sections = [(0, self.document)]
+        if escape:
+            children = None if _plain(title) else self.inline(
+                escape_text(title))
+        else:
+            children = self.inline(title)
+        self.add_section(title, 1, children)
+
+    def add_section(self, text, depth, children=None):
+        while self.sections[-1][0] >= depth:
+            self.sections.pop()
+        section = nodes.section()
+        self.sections[-1][1].append(section)
+        title = nodes.title(text, '', *(children or [nodes.Text(text)]))
+        section['names'].append(nodes.fully_normalize_name(title.astext()))
+        section += title
+        self.document.note_implicit_target(section, section)
+        self.sections.append((depth, section))
+
+    def add(self, node):
+        self.sections[-1][1].append(node)
+
+    def inline(self, text):
+        """
+        Returns the inline nodes of the rst ``text``.
+        """
+        if escape_text(text) == text and _plain(text):
+            return [nodes.Text(text)]
+        document = self.parse(text)
+        if len(document) == 1 and isinstance(document[0], nodes.paragraph):
+            return document[0].children
+        return [nodes.Text(text)]
+
+    def parse(self, text):
+        """
+        Returns the docutils document of the rst ``text``.
+        """
+        if self.parser is None:
+            self.parser = Parser()
+        document = utils.new_document('<string>', self.document.settings)
+        self.parser.parse(text, document)
+        return document
+
+    def paragraph(self, node, depth):
+        if not node.escape or not _plain(node.text):
+            return self.fallback(node, depth)
+        self.add(nodes.paragraph(node.text, '', nodes.Text(node.text)))
+
+    def section(self, node, depth):
+        text = node.text
+        if not node.escape:
+            children = self.inline(text)
+        elif not _plain(text):
+            children = self.inline(escape_text(text))
+        else:
+            children = None
+        self.add_section(text, node.depth or depth, children)
+
+    def items(self, node, depth):
+        if not node.escape:
+            return self.fallback_items(node, depth)
+        texts = [text_type(text) for text in node.iter_items()]
+        if not all(map(_plain, texts)):
+            # the items of lazy lists can only be read once
+            return self.fallback_items(type(node)(texts), depth)
+        if isinstance(node, Orderedlist):
+            items = nodes.enumerated_list(enumtype='arabic', prefix='',
+                                          suffix='.')
+        else:
+            items = nodes.bullet_list(bullet='*')
+        for text in texts:
+            items += nodes.list_item(text, nodes.paragraph(
+                text, '', nodes.Text(text)))
+        self.add_quote(nodes.block_quote('', items))
+
+    def fallback_items(self, node, depth):
+        """
+        Adds a list the builder can not build by parsing its rst.
+        """
+        children = self.parse_node(node, depth)
+        if len(children) == 1 and isinstance(children[0], nodes.block_quote):
+            return self.add_quote(children[0])
+        for child in children:
+            self.add(child)
+
+    def add_quote(self, quote):
+        """
+        Adds the block quote of a list. The items are indented, which
+        makes a block quote, and lists right after each other are in the
+        same one, with the items of bullet lists in the same list.
+        """
+        parent = self.sections[-1][1]
+        if not parent.children or parent[-1] is not self.quote:
+            self.add(quote)
+            self.quote = quote
+            return
+        for items in list(quote.children):
+            quote.remove(items)
+            last = self.quote[-1]
+            if (isinstance(items, nodes.bullet_list) and
+                    isinstance(last, nodes.bullet_list) and
+                    items['bullet'] == last['bullet']):
+                for item in list(items.children):
+                    items.remove(item)
+                    last += item
+            else:
+                self.quote += items
+
+    def table(self, node, depth):
+        if not node.escape or node.format != 'list':
+            return self.fallback(node, depth)
+        rows = [[text_type(cell) for cell in row] for row in node.iter_rows()]
+        rows = [row for row in rows if row]
+        header = [text_type(cell) for cell in node.header or ()]
+        width = len(header or (rows and rows[0]))
+        if (not width or not _plain(node.text or u'') or
+                not all(map(_plain, header)) or
+                not all(_plain(text) for row in rows for text in row)):
+            # the rows of a cursor can only be read once
+            table = Table(node.text, node.header, node.width)
+            table.add_rows(rows)
+            return self.fallback(table, depth)
+        table = nodes.table()
+        if node.text:
+            table += nodes.title(node.text, '', nodes.Text(node.text))
+        tgroup = nodes.tgroup(cols=width)
+        table += tgroup
+        for index in range(width):
+            tgroup += nodes.colspec(colwidth=100 // width)
+        if header:
+            tgroup += nodes.thead('', self.row(header))
+        tgroup += nodes.tbody('', *[self.row(row) for row in rows])
+        self.add(table)
+
+    def row(self, cells):
+        row = nodes.row()
+        for text in cells:
+            entry = nodes.entry()
+            if text:
+                entry += nodes.paragraph(text, '', nodes.Text(text))
+            row += entry
+        return row
+
+    def code(self, node, depth):
+        if node.path is not None:
+            first, last = node.lines or (1, None)
+            with io.open(node.path, encoding=node.encoding) as fobj:
+                code = u''.join(itertools.islice(fobj, first - 1, last))
+            code = code.rstrip(u'\n')
+        else:
+            code = node.code
+        classes = ['code']
+        if node.lang:
+            classes.append(node.lang)
+        settings = self.document.settings
+        try:
+            tokens = Lexer(code, node.lang, settings.syntax_highlight)
+        except LexerError:
+            tokens = Lexer(code, node.lang, 'none')
+        if node.linenos:
+            # Sphinx's linenos is the number-lines option of docutils
+            tokens = NumberLines(tokens, 1, 1 + len(code.split(u'\n')))
+        block = nodes.literal_block(code, classes=classes)
+        for classes, value in tokens:
+            if classes:
+                block += nodes.inline(value, value, classes=classes)
+            else:
+                block += nodes.Text(value)
+        self.add(block)
+
+    def fallback(self, node, depth):
+        """
+        Adds a node the builder does not know by parsing its rst.
+        """
+        for child in self.parse_node(node, depth):
+            self.add(child)
+
+    def parse_node(self, node, depth):
+        """
+        Returns the docutils nodes of the rst of ``node``.
+        """
+        out = _new_buffer()
+        render_child(out, node, depth)
+        document = self.parse(out.getvalue())
+        children = list(document.children)
+        for child in children:
+            document.remove(child)
+        return children
+
+
+_HANDLERS = {
+    Paragraph: _Builder.paragraph,
+    Section: _Builder.section,
+    Bulletlist: _Builder.items,
+    Orderedlist: _Builder.items,
+    Table: _Builder.table,
+    CodeBlock: _Builder.code,
+}
+
+
+def to_doctree(document, settings=None):
+    """
+    Returns the docutils document tree of ``document``, the one docutils
+    makes of its rst, see ``Document.to_doctree``.
+
+    :arg document: The ``rst.Document``.
+    :arg settings: docutils settings, the defaults of the rst parser if
+        ``None``.
+    """
+    if nodes is None:
+        raise ImportError('to_doctree needs docutils')
+    builder = _Builder(document.title, document.escape,
+                       settings or _default_settings())
+    for node, depth in walk(document.children):
+        kind = type(node)
+        handler = _HANDLERS.get(kind)
+        if handler is None or get_renderer(kind) is not kind.__dict__['render']:
+            # the rst of other nodes and renderers is parsed
+            handler = _Builder.fallback
+        handler(builder, node, depth)
+    doctree = builder.document
+    doctree.transformer.populate_from_components((Reader(), Parser()))
+    doctree.transformer.apply_transforms()
+    return doctree
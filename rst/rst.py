@@ -20,34 +20,1369 @@
 
 from __future__ import print_function
 
+import binascii
 import codecs
-try:
-    import StringIO
-except:
-    import io
-from six import u
-
-def create_section(text, depth):
-    marks = u('=-+#')
-    if depth == 1:
-        return u("{}\n{}\n{}\n\n".format(marks[depth -1] * len(text), text, marks[depth -1] * len(text)))
+import collections
+import contextlib
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import timeit
+import unicodedata
+from sys import intern as _intern
+from six import text_type, u
+
+class HeadingStyle(object):
+    """
+    Represents the adornment of section headings, for ``set_heading_style``.
+
+    :arg chars: Adornment character of each depth, starting at depth 1.
+    :arg overline: Depths which get an overline too.
+    """
+    def __init__(self, chars, overline=(1,)):
+        self.levels = tuple((char, depth in overline)
+                            for depth, char in enumerate(chars, 1))
+
+
+_HASH_VERSION = 2
+
+DEFAULT_HEADING_STYLE = HeadingStyle(u('=-+#~^"\'`:.*_'))
+
+_heading_style = DEFAULT_HEADING_STYLE
+
+
+def _build_section(text, depth, style):
+    if not 0 < depth <= len(style.levels):
+        raise ValueError('Section depth %d, the heading style has %d levels'
+                         % (depth, len(style.levels)))
+    char, overline = style.levels[depth - 1]
+    line = char * column_width(text)
+    lead = '' if depth == 1 else '\n'
+    if overline:
+        return '{}{}\n{}\n{}\n\n'.format(lead, line, text, line)
+    return '{}{}\n{}\n\n'.format(lead, text, line)
+
+
+_section_cache = functools.lru_cache(maxsize=4096)(_build_section)
+
+
+def create_section(text, depth, style=None):
+    """
+    Returns the heading of a section, the headings are kept in a bounded
+    LRU cache keyed by ``(text, depth, style)``. Raises ``ValueError`` if
+    the style has no adornment for ``depth``.
+
+    :arg text: Title of the section.
+    :arg depth: Depth of the section.
+    :arg style: Heading style, the one of ``set_heading_style`` by default.
+    """
+    return _section_cache(text, depth, style or _heading_style)
+
+
+def set_heading_style(style=None):
+    """
+    Sets the ``HeadingStyle`` used by all documents.
+    Incremental documents keep the headings they already rendered, and
+    the worker processes of a parallel render get the style of the
+    caller.
+
+    :arg style: The new style, ``DEFAULT_HEADING_STYLE`` if ``None``.
+    """
+    global _heading_style
+    _heading_style = style or DEFAULT_HEADING_STYLE
+
+
+def set_section_cache_size(maxsize):
+    """
+    Sets the number of headings kept by ``create_section``, dropping the
+    cached ones.
+
+    :arg maxsize: Number of headings, ``None`` for no limit.
+    """
+    global _section_cache
+    _section_cache = functools.lru_cache(maxsize=maxsize)(_build_section)
+
+
+def section_cache_info():
+    """
+    Returns the ``hits``, ``misses``, ``maxsize`` and ``currsize`` of the
+    heading cache of ``create_section``.
+    """
+    return _section_cache.cache_info()
+
+
+_DOTS_RE = re.compile(r'(^|\s)(?=\.\.)')
+
+
+def escape_text(text):
+    """
+    Returns ``text`` with the characters starting inline markup escaped
+    with a backslash: backslash, star, backquote, bar, and two dots at the
+    start of the text or after white space. Text without any of them is
+    returned as it is.
+
+    :arg text: Text to escape.
+    """
+    # one C level scan per character beats a regex or str.translate here
+    if '\\' in text:
+        text = text.replace('\\', '\\\\')
+    if '*' in text:
+        text = text.replace('*', '\\*')
+    if '`' in text:
+        text = text.replace('`', '\\`')
+    if '|' in text:
+        text = text.replace('|', '\\|')
+    if '..' in text:
+        text = _DOTS_RE.sub(r'\1\\', text)
+    return text
+
+
+def print_table(out, header, escape=False):
+    if escape:
+        header = [escape_text(text_type(hdr)) for hdr in header]
+    for i, hdr in enumerate(header):
+        if i == 0:
+            out.write(u('    * -  %s\n') % hdr)
+        else:
+            out.write(u('      -  %s\n') % hdr)
+
+
+def print_rows(out, rows, batch=1024, escape=False):
+    """
+    Writes the rows of a list-table to ``out``, every row is formatted
+    with a single join and the rows are written in batches.
+
+    :arg rows: Iterable of rows, each row a sequence of cells.
+    :arg batch: Number of rows to write at once.
+    :arg escape: Escape the cells, see ``escape_text``.
+    """
+    head = u('    * -  ')
+    sep = u('\n      -  ')
+    lines = []
+    for row in rows:
+        cells = sep.join(map(text_type, row))
+        if escape:
+            # the separators hold no markup, escape the row in one go
+            cells = escape_text(cells)
+        # only rows without cells are skipped, like print_table did
+        if cells or len(row):
+            lines.append(head + cells + u('\n'))
+        if len(lines) == batch:
+            out.write(u('').join(lines))
+            del lines[:]
+    if lines:
+        out.write(u('').join(lines))
+
+
+def print_items(out, items, ordered=False, batch=1024, escape=False):
+    """
+    Writes the items of a list to ``out``, the items are formatted and
+    written in batches with a single join each.
+
+    :arg items: Iterable of items.
+    :arg ordered: ``True`` for an ordered list.
+    :arg batch: Number of items to write at once.
+    :arg escape: Escape the items, see ``escape_text``.
+    """
+    items = iter(items)
+    start = 1
+    sep = u('\n    * ')
+    while True:
+        chunk = list(itertools.islice(items, batch))
+        if not chunk:
+            break
+        if ordered:
+            text = u('').join([u('    %d. %s\n') % (i, item)
+                               for i, item in enumerate(chunk, start)])
+            if escape:
+                # the numbers hold no markup, escape the batch in one go
+                text = escape_text(text)
+        else:
+            chunk = map(text_type, chunk)
+            if escape:
+                chunk = map(escape_text, chunk)
+            text = u('    * ') + sep.join(chunk) + u('\n')
+        start += batch
+        out.write(text)
+
+
+_WIDE = frozenset(('W', 'F'))
+
+
+def column_width(text):
+    """
+    Returns the number of columns ``text`` takes in a monospaced font,
+    like ``docutils.utils.column_width``: East Asian wide characters take
+    two columns and combining characters none.
+    """
+    if text.isascii():
+        return len(text)
+    width = len(text)
+    for char in text:
+        if unicodedata.east_asian_width(char) in _WIDE:
+            width += 1
+        elif unicodedata.combining(char):
+            width -= 1
+    return width
+
+
+def _max_width(cells):
+    """
+    Returns the width of the widest of ``cells``, 0 if there are none.
+    """
+    width = max(map(len, cells), default=0)
+    if not u('').join(cells).isascii():
+        width = max(map(column_width, cells))
+    return width
+
+
+def _pad(cells, widths):
+    """
+    Returns ``cells`` padded with spaces to ``widths`` columns.
+    """
+    return [cell + u(' ') * (width - column_width(cell))
+            for cell, width in zip(cells, widths)]
+
+
+def column_widths(rows):
+    """
+    Returns the width of every column of ``rows``, the display width of
+    its longest cell, see ``column_width``. Columns of ASCII text are
+    measured with a single ``map(len, ...)``.
+
+    :arg rows: List of rows, all of the same length.
+    """
+    return [_max_width(col) for col in zip(*rows)]
+
+
+def _table_columns(rows, width, escape):
+    """
+    Returns the columns of ``rows`` as lists of single line text cells,
+    rows shorter than ``width`` are padded with empty cells.
+    """
+    pad = [u('')] * width
+    rows = [row if len(row) == width else (list(row) + pad)[:width]
+            for row in rows]
+    columns = []
+    sep = u('\x1f')
+    newline = u('\n')
+    space = u(' ')
+    for col in zip(*rows):
+        # the column is cleaned in one go, unless a cell holds the separator
+        try:
+            line = sep.join(col)
+        except TypeError:
+            col = list(map(text_type, col))
+            line = sep.join(col)
+        if line.count(sep) >= len(col):
+            col = [cell.replace(newline, space) for cell in col]
+            if escape:
+                col = [escape_text(cell) for cell in col]
+        else:
+            if newline in line:
+                line = line.replace(newline, space)
+            if escape:
+                line = escape_text(line)
+            col = line.split(sep)
+        columns.append(col)
+    return columns
+
+
+def _table_widths(header, rows, widths):
+    """
+    Returns ``widths``, or the widths of the columns of ``header`` and
+    ``rows`` if it is ``None``.
+    """
+    if widths is None:
+        widths = column_widths(([header] if header else []) + list(rows))
+    return widths
+
+
+def print_grid(out, header, rows, batch=1024, widths=None):
+    """
+    Writes a grid table to ``out``, indented for a ``table`` directive.
+
+    :arg header: List of header cells or ``None``.
+    :arg rows: List of rows, sequences of text cells of the same length.
+    :arg batch: Number of rows to write at once.
+    :arg widths: Width of every column, measured from the cells if
+        ``None``.
+    """
+    widths = _table_widths(header, rows, widths)
+    border = u('    +') + u('+').join(u('-') * (w + 2) for w in widths) + u('+\n')
+    template = u('    | ') + u(' | ').join(u('%%-%ds') % w for w in widths) + u(' |\n')
+    out.write(border)
+    if header:
+        text = template % tuple(header)
+        if not text.isascii():
+            text = _grid_line(header, widths)
+        out.write(text)
+        out.write(border.replace(u('-'), u('=')))
+    line = template + border.replace(u('%'), u('%%'))
+    for start in range(0, len(rows), batch):
+        chunk = rows[start:start + batch]
+        text = u('').join([line % tuple(row) for row in chunk])
+        if not text.isascii():
+            # the template pads by length, wide characters need more
+            text = u('').join([_grid_line(row, widths) + border
+                               for row in chunk])
+        out.write(text)
+
+
+def _grid_line(row, widths):
+    """
+    Returns the line of a row of a grid table, padded by display width.
+    """
+    return u('    | ') + u(' | ').join(_pad(row, widths)) + u(' |\n')
+
+
+def _simple_cell(row):
+    """
+    Returns the first cell of a row of a simple table, escaped if the row
+    would be read as a continuation line or as a border.
+    """
+    cell = row[0]
+    if not cell.strip():
+        return u('\\ ')
+    if cell[0] == u('=') and not u('').join(row).replace(u('='), u('')).strip():
+        return u('\\') + cell
+    return cell
+
+
+# an empty cell, or one starting with whitespace or =, in cells each
+# preceded by the separator of _table_columns
+_SIMPLE_GUARD_RE = re.compile(u('\x1f(?:[=\\s]|$)'))
+
+
+def _simple_guard(cells):
+    """
+    Returns the indexes of the first ``cells`` of the rows of a simple
+    table which may need ``_simple_cell``.
+    """
+    sep = u('\x1f')
+    if _SIMPLE_GUARD_RE.search(sep + sep.join(cells)) is None:
+        return []
+    eq = u('=')
+    return [index for index, cell in enumerate(cells)
+            if not cell.strip() or cell[0] == eq]
+
+
+def print_simple(out, header, rows, batch=1024, widths=None):
+    """
+    Writes a simple table to ``out``, indented for a ``table`` directive.
+    Blank cells of the first column are written as an escaped space, a
+    blank first cell would make the row a continuation line, and rows of
+    ``=`` only start with a backslash, they would be read as a border.
+
+    :arg header: List of header cells or ``None``.
+    :arg rows: List of rows, sequences of text cells of the same length.
+    :arg batch: Number of rows to write at once.
+    :arg widths: Width of every column, measured from the cells if
+        ``None``.
+    """
+    guard = _simple_guard([row[0] for row in rows])
+    if guard:
+        rows = list(rows)
+        for index in guard:
+            row = rows[index]
+            rows[index] = (_simple_cell(row),) + tuple(row[1:])
+    if header and _simple_guard(header[:1]):
+        header = [_simple_cell(header)] + list(header[1:])
+    widths = _table_widths(header, rows, widths)
+    widths = [w or 1 for w in widths]
+    border = u('    ') + u('  ').join(u('=') * w for w in widths) + u('\n')
+    template = u('    ') + u('  ').join(u('%%-%ds') % w for w in widths)
+    out.write(border)
+    if header:
+        out.write(_simple_line(header, template, widths))
+        out.write(border)
+    newline = u('\n')
+    for start in range(0, len(rows), batch):
+        chunk = rows[start:start + batch]
+        text = u('').join([(template % tuple(row)).rstrip() + newline
+                           for row in chunk])
+        if not text.isascii():
+            # the template pads by length, wide characters need more
+            text = u('').join([_simple_line(row, template, widths)
+                               for row in chunk])
+        out.write(text)
+    out.write(border)
+
+
+def _simple_line(row, template, widths):
+    """
+    Returns the line of a row of a simple table, padded by display width.
+    """
+    line = template % tuple(row)
+    if not line.isascii():
+        line = u('    ') + u('  ').join(_pad(row, widths))
+    return line.rstrip() + u('\n')
+
+
+_RENDERERS = {}
+_RENDERER_CACHE = {}
+
+
+def register_renderer(node_type, renderer):
+    """
+    Registers ``renderer`` for ``node_type`` and all of its subclasses.
+
+    The renderer is called as ``renderer(node, out, depth)``, where
+    ``depth`` is the section depth at the position of the node, and takes
+    precedence over the ``render`` method of the node class.
+
+    :arg node_type: Class of the nodes to render.
+    :arg renderer: Callable writing the rst of a node to ``out``.
+    """
+    _RENDERERS[node_type] = renderer
+    _RENDERER_CACHE.clear()
+
+
+def get_renderer(node_type):
+    """
+    Returns the renderer for ``node_type``, ``None`` if there is none.
+
+    The lookup walks the MRO of the class once, the result is cached.
+    """
+    try:
+        return _RENDERER_CACHE[node_type]
+    except KeyError:
+        pass
+    renderer = None
+    for klass in node_type.__mro__:
+        if klass in _RENDERERS:
+            renderer = _RENDERERS[klass]
+            break
+        if 'render' in klass.__dict__:
+            renderer = klass.__dict__['render']
+            break
+    _RENDERER_CACHE[node_type] = renderer
+    return renderer
+
+
+def walk(nodes, depth=1):
+    """
+    Yields ``(node, depth)`` for ``nodes`` and all of their descendants in
+    document order.
+
+    The tree is walked with an explicit stack, so deep or wide trees do
+    not hit the recursion limit.
+
+    :arg nodes: Iterable of ``Node`` objects.
+    :arg depth: Section depth of the nodes.
+    """
+    stack = []
+    children = iter(nodes)
+    while True:
+        for node in children:
+            yield node, depth
+            nodes = getattr(node, '_children', None)
+            if nodes and node.nested:
+                stack.append((children, depth))
+                depth = node.child_depth(depth)
+                children = iter(nodes)
+                break
+        else:
+            if not stack:
+                return
+            children, depth = stack.pop()
+
+
+def render_child(out, child, depth=1):
+    """
+    Writes the rst representation of a single child node to ``out``.
+
+    Children of the node are not written, see ``walk``.
+    """
+    try:
+        renderer = _RENDERER_CACHE[type(child)]
+    except KeyError:
+        renderer = get_renderer(type(child))
+    if renderer is None:
+        raise TypeError('No renderer for %r' % type(child).__name__)
+    if _RENDER_HOOKS:
+        _render_hooked(out, child, depth, renderer)
+        return
+    renderer(child, out, depth)
+
+
+_RENDER_HOOKS = []
+
+
+def add_render_hook(pre=None, post=None):
+    """
+    Adds callbacks called around the render of every node, returns a
+    handle for ``remove_render_hook``. Without hooks rendering does not
+    pay for them.
+
+    Nodes rendered in worker processes, see ``Document.get_rst``, do not
+    call the hooks.
+
+    :arg pre: Called as ``pre(node, depth)`` before the node is rendered.
+    :arg post: Called as ``post(node, depth, seconds, size)`` after it,
+        with the render time and the number of characters written.
+        ``size`` is ``None`` if the output can not tell its position.
+    """
+    hook = (pre, post)
+    _RENDER_HOOKS.append(hook)
+    return hook
+
+
+def remove_render_hook(hook):
+    """
+    Removes a hook added by ``add_render_hook``.
+    """
+    _RENDER_HOOKS.remove(hook)
+
+
+def _render_hooked(out, child, depth, renderer):
+    """
+    Renders a node calling the render hooks around it.
+    """
+    hooks = list(_RENDER_HOOKS)
+    for pre, post in hooks:
+        if pre is not None:
+            pre(child, depth)
+    try:
+        position = out.tell()
+    except (AttributeError, IOError, OSError):
+        position = None
+    start = timeit.default_timer()
+    renderer(child, out, depth)
+    seconds = timeit.default_timer() - start
+    size = None if position is None else out.tell() - position
+    for pre, post in hooks:
+        if post is not None:
+            post(child, depth, seconds, size)
+
+
+class RenderProfile(object):
+    """
+    Number of rendered nodes, render time and characters written for
+    every node type, collected by ``profile``. The time of a node does
+    not include the one of its children.
+    """
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, node, depth, seconds, size):
+        """
+        Adds the render of ``node`` to the profile, it is a ``post``
+        render hook.
+        """
+        name = type(node).__name__
+        with self._lock:
+            entry = self.stats.get(name)
+            if entry is None:
+                entry = self.stats[name] = [0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += size or 0
+
+    def as_dict(self):
+        """
+        Returns ``{type name: {'count', 'seconds', 'chars'}}``.
+        """
+        return dict((name, {'count': count, 'seconds': seconds,
+                            'chars': chars})
+                    for name, (count, seconds, chars) in self.stats.items())
+
+    def to_json(self):
+        """
+        Returns the profile as JSON, see ``as_dict``.
+        """
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='rst_render'):
+        """
+        Returns the profile in the text format of Prometheus, one counter
+        for the nodes, the seconds and the characters of every type.
+
+        :arg prefix: Prefix of the metric names.
+        """
+        lines = []
+        for metric, index, text in (
+                ('nodes', 0, 'Number of rendered nodes.'),
+                ('seconds', 1, 'Time spent rendering nodes.'),
+                ('chars', 2, 'Characters written by the nodes.')):
+            name = '%s_%s_total' % (prefix, metric)
+            lines.append('# HELP %s %s' % (name, text))
+            lines.append('# TYPE %s counter' % name)
+            for kind in sorted(self.stats):
+                lines.append('%s{type="%s"} %r' % (
+                    name, kind, self.stats[kind][index]))
+        return '\n'.join(lines) + '\n'
+
+
+@contextlib.contextmanager
+def profile():
+    """
+    Context manager collecting a ``RenderProfile`` of the nodes rendered
+    in its block, in any thread.
+
+    .. doctest::
+
+        >>> import rst
+        >>> doc = rst.Document('Title of the report')
+        >>> doc.add_child(rst.Paragraph('Some text.'))
+        True
+        >>> with rst.profile() as prof:
+        ...     text = doc.get_rst()
+        >>> prof.as_dict()['Paragraph']['chars']
+        12
+    """
+    result = RenderProfile()
+    hook = add_render_hook(post=result.record)
+    try:
+        yield result
+    finally:
+        remove_render_hook(hook)
+
+
+def _open_csv(path, encoding):
+    """
+    Opens a CSV file for ``csv.reader``.
+    """
+    return io.open(path, 'r', encoding=encoding, newline='')
+
+
+class _CSVRows(object):
+    """
+    Row source of ``Table.from_csv``, a class so that it can be pickled.
+    """
+    def __init__(self, path, encoding, skip, fmtparams):
+        self.path = path
+        self.encoding = encoding
+        self.skip = skip
+        self.fmtparams = fmtparams
+
+    def hash_key(self):
+        stat = os.stat(self.path)
+        return (self.path, self.encoding, self.skip,
+                sorted(self.fmtparams.items()), stat.st_mtime, stat.st_size)
+
+    def __call__(self):
+        with _open_csv(self.path, self.encoding) as fobj:
+            reader = csv.reader(fobj, **self.fmtparams)
+            for row in itertools.islice(reader, self.skip, None):
+                yield row
+
+
+class _ArrayRows(object):
+    """
+    Row source of ``Table.from_array``, a class so that it can be pickled.
+    """
+    def __init__(self, array):
+        self.array = array
+
+    def hash_key(self):
+        array = self.array
+        data = hashlib.sha1(array.tobytes()).hexdigest()
+        return (array.dtype.descr, array.shape, data)
+
+    def __call__(self):
+        for row in self.array:
+            yield row.tolist()
+
+
+def _render_nodes(nodes, style=None):
+    """
+    Returns the rst of ``nodes`` and their descendants, used by the
+    worker processes of a parallel render.
+
+    :arg style: Heading style of the parent process, the global of a
+        worker started with ``spawn`` or ``forkserver`` is the default.
+    """
+    if style is not None:
+        set_heading_style(style)
+    out = _new_buffer()
+    for child, depth in walk(nodes):
+        render_child(out, child, depth)
+    return out.getvalue()
+
+
+def _tracked(name):
+    """
+    Returns a property kept in ``_<name>``, assigning to it marks the
+    node dirty.
+    """
+    attr = '_' + name
+
+    def fget(self):
+        return getattr(self, attr)
+
+    def fset(self, value):
+        setattr(self, attr, value)
+        self.mark_dirty()
+
+    return property(fget, fset)
+
+
+# set once a node keeps its rst, Node.mark_dirty has nothing to drop before
+_fragments_kept = False
+
+
+def _keep_fragments():
+    """
+    Notes that nodes keep their rst from now on, see ``Node.mark_dirty``.
+    """
+    global _fragments_kept
+    _fragments_kept = True
+
+
+def _new_buffer():
+    """
+    Returns an empty in memory text buffer.
+    """
+    return io.StringIO()
+
+
+def _is_binary(fobj):
+    """
+    Returns ``True`` if the file object expects bytes instead of text.
+    """
+    if isinstance(fobj, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    if isinstance(fobj, (io.TextIOBase, codecs.StreamWriter,
+                         codecs.StreamReaderWriter)):
+        return False
+    return 'b' in getattr(fobj, 'mode', '')
+
+
+def _open_output(path, old, matched, atomic):
+    """
+    Opens ``path`` for ``_write_file``, positioned after the first
+    ``matched`` bytes of the old file ``old``. Returns the file object and
+    the path of the temporary file, ``None`` for a direct write.
+    """
+    if atomic:
+        tmp = '%s.%s.tmp' % (path, binascii.hexlify(os.urandom(4)).decode())
+        out = io.open(tmp, 'xb')
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        if matched:
+            old.seek(0)
+            while matched:
+                data = old.read(min(matched, 1 << 16))
+                out.write(data)
+                matched -= len(data)
+        return out, tmp
+    if matched:
+        out = io.open(path, 'r+b')
+        out.seek(matched)
+        return out, None
+    return io.open(path, 'wb'), None
+
+
+def _write_file(path, chunks, skip_unchanged=False, atomic=False, size=None):
+    """
+    Writes the byte strings ``chunks`` to ``path``, returns ``False`` if
+    the file was left alone because it already held them.
+
+    :arg skip_unchanged: Compare the chunks with the file while they are
+        written, the file is only written from the first difference on.
+    :arg atomic: Write to a temporary file, renamed to ``path`` at the end.
+    :arg size: Total size of the chunks if known, a file of another size
+        is not compared.
+    """
+    old = None
+    if skip_unchanged:
+        try:
+            if size is None or os.path.getsize(path) == size:
+                old = io.open(path, 'rb')
+        except (IOError, OSError):
+            pass
+    matched = 0
+    out = tmp = None
+    try:
+        for data in chunks:
+            if out is None:
+                if old is not None and old.read(len(data)) == data:
+                    matched += len(data)
+                    continue
+                out, tmp = _open_output(path, old, matched, atomic)
+            out.write(data)
+        if out is None:
+            if old is not None and not old.read(1):
+                return False
+            out, tmp = _open_output(path, old, matched, atomic)
+        out.truncate()
+        out.close()
+        if tmp is not None:
+            os.replace(tmp, path)
+    except BaseException:
+        if out is not None:
+            out.close()
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        if old is not None:
+            old.close()
+    return True
+
+
+class RenderCache(object):
+    """
+    Represents a directory of rendered documents, keyed by the
+    ``Document.structure_hash`` of the documents. When the files take more
+    than ``max_bytes`` the least recently used ones are removed.
+
+    :arg directory: Path of the directory, it is created if needed.
+    :arg max_bytes: Size limit of the directory.
+    """
+    def __init__(self, directory, max_bytes=64 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.rst')
+
+    def get(self, key):
+        """
+        Returns the rst kept for ``key``, ``None`` if there is none.
+        """
+        path = self._path(key)
+        try:
+            with io.open(path, encoding='utf-8') as fobj:
+                text = fobj.read()
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        return text
+
+    def put(self, key, text):
+        """
+        Keeps ``text`` as the rst for ``key``.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fobj:
+            fobj.write(text.encode('utf-8'))
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.rst'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+RenderStats = collections.namedtuple('RenderStats', 'path seconds size')
+
+_local = threading.local()
+
+
+def _save_document(item, style=None):
+    """
+    Renders and saves a single ``(path, document)`` pair of
+    ``render_many``, reusing the text buffer of the current thread.
+
+    :arg style: Heading style of the parent process, for workers.
+    """
+    if style is not None:
+        set_heading_style(style)
+    path, document = item
+    start = timeit.default_timer()
+    out = getattr(_local, 'buffer', None)
+    if out is None:
+        out = _local.buffer = _new_buffer()
+    out.seek(0)
+    out.truncate()
+    if document.incremental:
+        out.write(document.get_rst())
+    else:
+        document._write_nodes(out)
+    data = out.getvalue().encode('utf-8')
+    with io.open(path, 'wb', buffering=1 << 16) as fobj:
+        fobj.write(data)
+    return RenderStats(path, timeit.default_timer() - start, len(data))
+
+
+def render_many(documents, out_dir, workers=None, executor='thread'):
+    """
+    Renders and saves many documents in one go, returns a list of
+    ``RenderStats(path, seconds, size)`` in the order of ``documents``,
+    ``size`` being the number of bytes written.
+
+    :arg documents: Iterable of ``(filename, Document)`` pairs, the
+        filenames are relative to ``out_dir``.
+    :arg out_dir: Directory to save the documents in, it is created if
+        needed.
+    :arg workers: Number of threads or processes, the documents are
+        rendered in the current thread by default.
+    :arg executor: ``'thread'`` or ``'process'``.
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    items = ((os.path.join(out_dir, name), document)
+             for name, document in documents)
+    if not workers:
+        return [_save_document(item) for item in items]
+    save = _save_document
+    if executor == 'thread':
+        from concurrent.futures import ThreadPoolExecutor as Executor
+    elif executor == 'process':
+        from concurrent.futures import ProcessPoolExecutor as Executor
+        # workers do not share the globals of this process
+        save = functools.partial(_save_document, style=_heading_style)
+    else:
+        raise ValueError('Unknown executor %r' % executor)
+    with Executor(max_workers=workers) as pool:
+        return list(pool.map(save, items, chunksize=32))
+
+
+_UNESCAPE_RE = re.compile(r'\\(.)', re.S)
+
+_ORDERED_RE = re.compile(r'    \d+\. ')
+
+
+def _unescape(texts):
+    """
+    Returns ``(texts, escape)`` for the node holding the rendered
+    ``texts``: the unescaped texts and ``True`` if they render back to
+    the same rst, the texts as they are and ``False`` otherwise.
+    """
+    # the separator holds no markup, all the texts are checked in one go
+    sep = u('\x1f')
+    rendered = sep.join(texts)
+    text = rendered
+    if '\\' in text:
+        text = _UNESCAPE_RE.sub(r'\1', text)
+    if escape_text(text) != rendered:
+        return texts, False
+    if len(texts) == 1:
+        return [text], True
+    plain = text.split(sep)
+    if len(plain) != len(texts):
+        # a text holds the separator, check them one by one
+        plain = [_unescape([text])[0][0] for text in texts]
+        if [escape_text(text) for text in plain] != list(texts):
+            return texts, False
+    return plain, True
+
+
+def _split_lines(fobj, size=1 << 16):
+    """
+    Yields lists of the lines of a text file object without their line
+    ends, reading ``size`` characters at a time.
+    """
+    rest = u('')
+    while True:
+        data = fobj.read(size)
+        if not data:
+            break
+        data = rest + data
+        if u('\r') in data:
+            data = data.replace(u('\r\n'), u('\n'))
+        lines = data.split(u('\n'))
+        rest = lines.pop()
+        yield lines
+    if rest:
+        yield [rest]
+
+
+def _heading(block, levels):
+    """
+    Returns the ``Section`` of a block of lines written by
+    ``create_section``, or ``None``.
+    """
+    if len(block) == 3:
+        line, text, under = block
+        if line != under:
+            return None
+    elif len(block) == 2:
+        line = None
+        text, under = block
+    else:
+        return None
+    level = levels.get(under[:1])
+    if (level is None or level[1] != (line is not None) or
+            len(under) != column_width(text) or under.strip(under[0]) or
+            not text.strip()):
+        return None
+    (text,), escape = _unescape([text])
+    return Section(text, level[0], escape=escape)
+
+
+def iter_nodes(lines, style=None):
+    """
+    Yields the nodes of rst written by ``Document``, one node at a time.
+    Only the lines of the current node are kept in memory, so files of
+    any size can be read.
+
+    Sections, paragraphs, bullet and enumerated lists, list-tables and
+    code-blocks are recognised, anything else is kept as a paragraph
+    which is written back unchanged. Sections are yielded with an explicit
+    ``depth`` and the nodes after them are not nested in them. Texts which
+    can not be written back by escaping get ``escape=False``.
+
+    :arg lines: Text file object, or any iterable of lines.
+    :arg style: ``HeadingStyle`` of the headings, the one of
+        ``set_heading_style`` by default.
+    """
+    style = style or _heading_style
+    levels = dict((char, (depth, overline))
+                  for depth, (char, overline) in enumerate(style.levels, 1))
+    if hasattr(lines, 'read'):
+        # splitting large chunks is much faster than reading line by line
+        lines = itertools.chain.from_iterable(_split_lines(lines))
     else:
-        #return u'\n' + text + u'\n' +  + u'\n\n'
-        return u("\n{}\n{}\n\n".format(text, marks[depth -1] * len(text)))
+        lines = (line.rstrip(u('\r\n')) for line in lines)
+    code_block = u('.. code-block::')
+    list_table = u('.. list-table::')
+    indent = u('    ')
+    linenos_option = u('    :linenos:')
+    option = u('    :')
+    header_rows = u('    :header-rows: 1')
+    first_cell = u('    * -')
+    next_cell = u('      -')
+    bullet = u('    * ')
+    ordered = _ORDERED_RE.match
+    pending = None
+    while True:
+        if pending is None:
+            line = next(lines, None)
+            if line is None:
+                return
+        else:
+            line, pending = pending, None
+        if not line:
+            continue
+
+        if line.startswith(code_block):
+            lang = line[15:].strip()
+            linenos = False
+            blank = False
+            code = []
+            for line in lines:
+                if not code and not blank:
+                    # the option and the blank line before the code
+                    if not linenos and line == linenos_option:
+                        linenos = True
+                        continue
+                    if not line:
+                        blank = True
+                        continue
+                if not line.startswith(indent):
+                    pending = line
+                    break
+                code.append(line[4:])
+            yield CodeBlock(u('\n').join(code), lang, linenos)
+
+        elif line.startswith(list_table):
+            title = line[16:]
+            header = False
+            width = None
+            rows = []
+            for line in lines:
+                if not rows and line.startswith(option):
+                    # width is written as it is after the indent, keep
+                    # its line ends
+                    if line.endswith(header_rows):
+                        header = True
+                        options = line[:-19]
+                        if next(lines, u('')):
+                            raise ValueError('Expected a blank line after '
+                                             'the options of %r' % title)
+                    else:
+                        options = line + u('\n')
+                    if width is None:
+                        options = options[4:]
+                    if options:
+                        width = (width or u('')) + options
+                elif line.startswith(first_cell):
+                    rows.append([line[9:]])
+                elif rows and line.startswith(next_cell):
+                    rows[-1].append(line[9:])
+                else:
+                    pending = line
+                    break
+            texts = [title]
+            for row in rows:
+                texts.extend(row)
+            texts, escape = _unescape(texts)
+            cells = iter(texts[1:])
+            rows = [[next(cells) for cell in row] for row in rows]
+            table = Table(texts[0], rows.pop(0) if header and rows else None,
+                          width, escape=escape)
+            table.add_rows(rows)
+            yield table
+
+        elif line.startswith(bullet):
+            items = [line[6:]]
+            for line in lines:
+                if not line.startswith(bullet):
+                    pending = line
+                    break
+                items.append(line[6:])
+            items, escape = _unescape(items)
+            yield Bulletlist(items, escape=escape)
+
+        elif ordered(line):
+            items = [line]
+            for line in lines:
+                if not ordered(line):
+                    pending = line
+                    break
+                items.append(line)
+            # the numbers hold no markup, only the texts are unescaped
+            items, escape = _unescape([item[item.index(u('. ')) + 2:]
+                                       for item in items])
+            yield Orderedlist(items, escape=escape)
+
+        else:
+            block = [line]
+            for line in lines:
+                if not line:
+                    break
+                block.append(line)
+            node = _heading(block, levels)
+            if node is None:
+                (text,), escape = _unescape(['\n'.join(block)])
+                node = Paragraph(text, escape=escape)
+            yield node
+
+
+_SLUG_RE = re.compile(r'[\W_]+', re.U)
+
+
+def _slug(text):
+    """
+    Returns a file name made of the words of ``text``.
+    """
+    return _SLUG_RE.sub('-', text.lower()).strip('-') or 'section'
+
+
+def _toctree(names):
+    """
+    Returns a ``toctree`` directive listing the documents ``names``.
+    """
+    return u('.. toctree::\n    :maxdepth: 2\n\n%s\n') % u('').join(
+        [u('    %s\n') % name for name in names])
+
+
+def _split_part(items, max_bytes, name, names):
+    """
+    Yields ``(name, rst)`` for a part of ``Document.save_split`` and for
+    the parts it is split in, the part first.
+
+    :arg items: ``(section, rst)`` of every node of the part, ``section``
+        is the depth of section nodes and ``None`` for the other nodes.
+    :arg name: File name of the part, without the extension.
+    :arg names: Set of the file names already taken.
+    """
+    depths = [depth for depth, text in items[1:] if depth is not None]
+    if (not depths or max_bytes is None or
+            sum(map(_utf8_size, [text for depth, text in items]))
+            <= max_bytes):
+        yield name, u('').join([text for depth, text in items])
+        return
+    split_depth = min(depths)
+    head = [items[0][1]]
+    index = 1
+    while index < len(items) and items[index][0] != split_depth:
+        head.append(items[index][1])
+        index += 1
+    parts = []
+    for depth, text in items[index:]:
+        if depth == split_depth:
+            parts.append([])
+        parts[-1].append((depth, text))
+    children = [_unique_name(name + '-' + _slug(_title_of(part[0][1])), names)
+                for part in parts]
+    head.append(_toctree(children))
+    yield name, u('').join(head)
+    for child, part in zip(children, parts):
+        for item in _split_part(part, max_bytes, child, names):
+            yield item
+
+
+def _utf8_size(text):
+    """
+    Returns the size of ``text`` encoded in UTF-8.
+    """
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-8'))
 
 
-def print_table(out, header):
-    for i, hdr in enumerate(header):
-        if i == 0:
-            out.write(u('    * -  %s\n') % hdr)
-        else:
-            out.write(u('      -  %s\n') % hdr)
+def _title_of(heading):
+    """
+    Returns the title of a section heading written by ``create_section``.
+    """
+    lines = heading.strip(u('\n')).split(u('\n'))
+    return lines[1] if len(lines) == 3 else lines[0]
+
+
+def _unique_name(name, names):
+    """
+    Returns ``name``, or ``name`` with a number appended if it is already
+    in ``names``, and adds it to ``names``.
+    """
+    unique = name
+    count = 1
+    while unique in names:
+        count += 1
+        unique = '%s-%d' % (name, count)
+    names.add(unique)
+    return unique
+
+
+# rough size of a node object with its slots, in bytes
+_NODE_BYTES = 200
+
+
+def _items_size(items):
+    """
+    Returns an estimate of the memory used by a list of items or rows,
+    from a sample of at most 4 of them.
+    """
+    if not items:
+        return 0
+    sample = items[::max(1, len(items) // 4)][:4]
+    getsizeof = sys.getsizeof
+    size = sum(map(getsizeof, sample))
+    for item in sample:
+        if isinstance(item, (list, tuple)):
+            size += sum(map(getsizeof, item))
+    return size * len(items) // len(sample) + 8 * len(items)
+
+
+def _estimate_size(node):
+    """
+    Returns a rough estimate of the memory used by ``node`` and the nodes
+    below it, in bytes, without rendering them.
+    """
+    size = 0
+    for child, depth in walk([node]):
+        size += _NODE_BYTES
+        for name in ('_text', '_code'):
+            value = getattr(child, name, None)
+            if isinstance(value, (str, text_type)):
+                size += sys.getsizeof(value)
+        if not getattr(child, 'nested', True):
+            size += _items_size(getattr(child, '_children', None))
+            for column in getattr(child, 'columns', None) or ():
+                size += _items_size(column)
+    return size
+
+
+def _render_value(out, value, depth):
+    """
+    Writes the value of a ``Placeholder`` to ``out``: a text as a
+    paragraph, a node with its children or an iterable of nodes.
+    """
+    if isinstance(value, (str, text_type)):
+        value = [Paragraph(value)]
+    elif isinstance(value, Node):
+        value = [value]
+    for node, node_depth in walk(value, depth):
+        render_child(out, node, node_depth)
+
+
+class Template(object):
+    """
+    Returns a ``Template``, the rst of a document compiled by
+    ``Document.compile``. The parts of the document around its
+    ``Placeholder`` nodes are rendered once, filling the template only
+    renders the values of the placeholders. A template can be pickled.
+
+    :arg parts: List of rendered texts and ``(name, depth, default)``
+        tuples for the placeholders.
+    """
+    def __init__(self, parts):
+        self.parts = parts
+
+    @property
+    def names(self):
+        """
+        Names of the placeholders, in document order.
+        """
+        return [part[0] for part in self.parts if isinstance(part, tuple)]
+
+    def fill(self, **values):
+        """
+        Returns the rst of the document with the placeholders replaced by
+        ``values``. A value can be a text, written as a paragraph, a
+        ``Node`` or an iterable of nodes.
+
+        :arg values: Value of every placeholder without a default.
+        """
+        out = _new_buffer()
+        for part in self.parts:
+            if not isinstance(part, tuple):
+                out.write(part)
+                continue
+            name, depth, default = part
+            value = values.get(name, default)
+            if value is None:
+                raise KeyError('No value for the placeholder %r' % name)
+            _render_value(out, value, depth)
+        return out.getvalue()
+
+
+class _Written(tuple):
+    """
+    Cached rst ``(depth, rst, index)`` of the top level child ``index``
+    of a document written by ``save(append=True)``, the rst is ``None``
+    unless the document is incremental. ``Node.mark_dirty`` tells the
+    document when it drops it.
+    """
+    __slots__ = ()
 
 
 class Document(object):
     """
     Returns a ``Document`` object.
 
+    With ``incremental=True`` the rendered rst of every node is cached
+    and only the nodes changed since the last render are rendered again.
+    Nodes know about their changes through ``add_child``, ``add_item``
+    and attribute assignment, call ``mark_dirty`` on a node after
+    changing it in any other way.
+
+    With ``max_memory`` the document keeps an estimate of the memory used
+    by its top level children. Once it is over ``max_memory`` bytes, all
+    the top level children but the last one, which may still be growing,
+    are rendered to a temporary file and removed from ``children``. The
+    rst of the document is then the one of the file followed by the one of
+    the remaining children. Spilled children can not be changed anymore,
+    and a spilled document can not be split, compiled, appended to, hashed
+    or pickled.
+
+    The title is escaped like the text of the nodes, unless ``escape`` is
+    ``False``.
+
     .. doctest::
 
         >>> import rst
@@ -60,9 +1395,71 @@ class Document(object):
         <BLANKLINE>
 
     """
-    def __init__(self, title):
-        self.title = title
+    _parent = None
+    _fragment = None
+    _escape = True
+    title = _tracked('title')
+    escape = _tracked('escape')
+
+    def __init__(self, title, incremental=False, max_memory=None,
+                 escape=True):
+        self._title = title
+        self._escape = escape
         self.children = []
+        self.incremental = incremental
+        self.max_memory = max_memory
+        self._memory = 0
+        self._spill = None
+        self._spilled = 0
+        self._appends = {}
+
+    def __getstate__(self):
+        if self._spill is not None:
+            raise TypeError('Can not pickle a document spilled to disk')
+        state = self.__dict__.copy()
+        # open files of save(append=True) stay with this process
+        state['_appends'] = {}
+        return state
+
+    @classmethod
+    def load(cls, source, incremental=False, encoding='utf-8', style=None,
+             max_memory=None):
+        """
+        Returns the ``Document`` of rst written by ``Document``, read line
+        by line, see ``iter_nodes``. The document title must come first.
+
+        :arg source: Path of the file or text file object.
+        :arg encoding: Encoding of the file, for a path.
+        :arg style: ``HeadingStyle`` of the headings, see ``iter_nodes``.
+        :arg max_memory: Memory budget of the document, see ``Document``.
+        """
+        if not hasattr(source, 'read'):
+            with io.open(source, encoding=encoding) as fobj:
+                return cls.load(fobj, incremental, encoding, style,
+                                max_memory)
+        nodes = iter_nodes(source, style)
+        title = next(nodes, None)
+        if not isinstance(title, Section) or title.depth != 1:
+            raise ValueError('Expected the title of the document first')
+        doc = cls(title.text, incremental, max_memory, title.escape)
+        for node in nodes:
+            doc.add_child(node)
+        return doc
+
+    def mark_dirty(self):
+        """
+        Drops the cached rst of the document.
+        """
+        self._fragment = None
+
+    def _heading(self):
+        """
+        Returns the heading of the document title.
+        """
+        title = self._title
+        if self._escape:
+            title = escape_text(title)
+        return create_section(title, 1)
 
     def add_child(self, node):
         """
@@ -70,89 +1467,702 @@ class Document(object):
         Returns ``True`` in case of success.
         """
         self.children.append(node)
+        if isinstance(node, Node):
+            node._parent = self
+        self._fragment = None
+        if self.max_memory is not None and len(self.children) > 1:
+            # the child before is complete now
+            self._memory += _estimate_size(self.children[-2])
+            if self._memory > self.max_memory:
+                self._spill_children()
         return True
 
-    def save(self, path):
+    def _spill_children(self, batch=1 << 16):
+        """
+        Renders all the top level children but the last one to the spill
+        file and removes them from ``children``.
+        """
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile()
+        spill = self._spill
+        spill.seek(0, os.SEEK_END)
+        done = self.children[:-1]
+        chunks = []
+        size = 0
+        for child, depth, text in self._iter_children(done):
+            chunks.append(text)
+            size += len(text)
+            if size >= batch:
+                spill.write(u('').join(chunks).encode('utf-8'))
+                chunks = []
+                size = 0
+        spill.write(u('').join(chunks).encode('utf-8'))
+        for child in done:
+            if isinstance(child, Node):
+                child._parent = None
+        self._spilled += len(done)
+        del self.children[:-1]
+        self._memory = 0
+
+    def _iter_spill(self, size=1 << 16):
+        """
+        Yields the rst of the spilled children in unicode chunks.
+        """
+        if self._spill is None:
+            return
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        offset = 0
+        while True:
+            # seek every time, the file may be written in between
+            self._spill.seek(offset)
+            data = self._spill.read(size)
+            if not data:
+                break
+            offset += len(data)
+            yield decoder.decode(data)
+        text = decoder.decode(b'', True)
+        if text:
+            yield text
+
+    def _check_spill(self, action):
         """
-        Saves the document in the given path.
+        Raises ``ValueError`` if the document was spilled to disk.
+        """
+        if self._spill is not None:
+            raise ValueError('Can not %s a document spilled to disk' % action)
+
+    def save(self, path, workers=None, cache=None, skip_unchanged=False,
+             atomic=False, append=False):
+        """
+        Saves the document in the given path. Returns ``False`` if the
+        file was left alone because it already held the document.
 
         :arg path: Path to save the document.
+        :arg workers: Number of processes to render with, see ``get_rst``.
+        :arg cache: ``RenderCache`` to take the rst from, see ``get_rst``.
+            The file is not written again if it already holds that rst.
+        :arg skip_unchanged: Compare the rst with the file while it is
+            rendered and do not write the file if nothing changed, so its
+            modification time is kept.
+        :arg atomic: Write to a temporary file in the same directory and
+            rename it over ``path``, readers never see a partial file.
+        :arg append: Only write the children added since the last save to
+            ``path`` with ``append=True``, at the end of the file which is
+            kept open until ``close``. The first save writes the whole
+            document. If a top level child already written, or a node
+            below it, changed since, see ``Node.mark_dirty``, the file is
+            written again from that child on. The whole document is
+            written again if the file was changed by anything else.
         """
-        fobj = codecs.open(path, 'w', 'utf-8')
-        fobj.write(self.get_rst())
-        fobj.close()
+        if append:
+            if cache is not None or skip_unchanged or atomic:
+                raise ValueError('append can not be used with cache, '
+                                 'skip_unchanged or atomic')
+            if self.max_memory is not None:
+                raise ValueError('append can not be used with max_memory')
+            return self._append(path)
+        self._close_append(path)
+        text = self._cached_rst(workers, cache)
+        if text is not None:
+            data = text.encode('utf-8')
+            return _write_file(path, [data], True, atomic, len(data))
+        if skip_unchanged or atomic:
+            chunks = (chunk.encode('utf-8') for chunk in self.iter_rst(workers))
+            return _write_file(path, chunks, skip_unchanged, atomic)
+        if self._spill is not None and not workers:
+            # the spilled rst is copied as it is
+            with io.open(path, 'wb') as fobj:
+                fobj.write(self._heading().encode('utf-8'))
+                self._spill.seek(0)
+                shutil.copyfileobj(self._spill, fobj, 1 << 16)
+                for child, depth, text in self._iter_children(self.children):
+                    fobj.write(text.encode('utf-8'))
+            return True
+        # no newline translation, like the binary writes above
+        fobj = io.open(path, 'w', encoding='utf-8', newline='')
+        try:
+            self.write_to(fobj, workers)
+        finally:
+            fobj.close()
+        return True
 
-    def get_rst(self):
+    def _append(self, path):
         """
-        Returns the rst representation of the document in unicode format.
+        Writes the children added since the last ``save`` with
+        ``append=True`` to the end of ``path``, and the children written
+        before which were marked dirty since, from the first of them on.
         """
+        key = os.path.abspath(path)
+        state = self._appends.get(key)
+        children = self.children
+        heading = self._heading()
+        if state is not None:
+            fobj, written, offsets, end, start = state
+            try:
+                stat = os.stat(path)
+                current = (stat.st_size == end and written == heading and
+                           len(offsets) <= len(children) and
+                           os.path.samestat(stat, os.fstat(fobj.fileno())))
+            except OSError:
+                current = False
+            if not current:
+                self._close_append(path)
+                state = None
+        if state is None:
+            fobj = io.open(path, 'wb')
+            offsets = []
+            head = heading.encode('utf-8')
+            start = 0
+        else:
+            head = b''
         try:
-            out = StringIO.StringIO()
-        except:
-            out = io.StringIO()
-        text = create_section(self.title, 1)
-        out.write(text)
-        #Now goto each children
-        for child in self.children:
-            if isinstance(child, Paragraph):
-                #We have a paragraph here
-                out.write(child.text + u('\n\n'))
-            elif isinstance(child, Section):
-                text = create_section(child.text, child.depth)
-                out.write(text)
-            elif isinstance(child, Bulletlist):
-                for ch in child.children:
-                    out.write(u("{}* {}\n".format(' ' * 4, ch)))
-                out.write(u('\n'))
-            elif isinstance(child, Orderedlist):
-                for i, ch in enumerate(child.children):
-                    out.write(u("{}{}. {}\n".format(' ' * 4, str(i+1), ch)))
-                out.write(u('\n'))
-            elif isinstance(child, Table):
-                out.write(u('.. list-table:: %s\n') % child.text)
-                if child.width:
-                    out.write(u('    %s') % child.width)
-                if child.header:
-                    out.write(u('    :header-rows: 1\n\n'))
-                    print_table(out, child.header)
-                for ch in child.children:
-                    print_table(out, ch)
-                out.write(u('\n'))
-            elif isinstance(child, CodeBlock):
-                out.write(u('.. code-block:: %s\n') % child.lang)
-                if child.linenos:
-                    out.write(u('    :linenos:\n\n'))
-                indented = "\n".join("    {}".format(l) for l in child.code.split("\n"))
-                out.write(u("{}\n".format(indented)))
+            if start < len(offsets):
+                # a child written before changed, see _child_changed
+                fobj.seek(offsets[start])
+                fobj.truncate()
+                del offsets[start:]
+            end = fobj.tell() + len(head)
+            data = [head]
+            for text in self._iter_top(children[start:]):
+                offsets.append(end)
+                text = text.encode('utf-8')
+                end += len(text)
+                data.append(text)
+            fobj.write(b''.join(data))
+            fobj.flush()
+        except BaseException:
+            fobj.close()
+            self._appends.pop(key, None)
+            raise
+        _keep_fragments()
+        for index, child in enumerate(children[start:], start):
+            fragment = getattr(child, '_fragment', None) or (None, None)
+            try:
+                child._fragment = _Written((fragment[0], fragment[1], index))
+            except AttributeError:
+                pass
+        self._appends[key] = [fobj, heading, offsets, end, len(offsets)]
+        return True
+
+    def _child_changed(self, index):
+        """
+        Called by ``Node.mark_dirty`` when the top level child ``index``
+        written by ``save(append=True)`` changed, the files are written
+        again from that child on.
+        """
+        for state in self._appends.values():
+            state[4] = min(state[4], index)
+
+    def _iter_top(self, children):
+        """
+        Yields the rst of every node of ``children`` together with the
+        nodes below it.
+        """
+        parts = []
+        index = 0
+        for child, depth, text in self._iter_children(children):
+            if index < len(children) and child is children[index]:
+                if index:
+                    yield u('').join(parts)
+                    parts = []
+                index += 1
+            parts.append(text)
+        if index:
+            yield u('').join(parts)
+
+    def _close_append(self, path):
+        """
+        Closes the file of ``path`` kept open by ``save(append=True)``.
+        """
+        state = self._appends.pop(os.path.abspath(path), None)
+        if state is not None:
+            state[0].close()
+
+    def close(self):
+        """
+        Closes the files kept open by ``save(append=True)``, the next
+        save to them writes the whole document.
+        """
+        for path in list(self._appends):
+            self._close_append(path)
+
+    def save_split(self, out_dir, max_bytes=None, split_depth=2, workers=4,
+                   index='index'):
+        """
+        Saves the document split in many files, for documents too large
+        for a single file. Returns the paths of all the files, the index
+        first.
+
+        Every section of depth ``split_depth`` or less starts a file of its
+        own, named after its title. The index file holds the title, the
+        nodes before the first of these sections and a ``toctree`` of the
+        files. With ``max_bytes`` a file larger than that is split again
+        at its sections of the next depth, listed in a ``toctree`` of its
+        own. The files are written by threads and only if they changed,
+        see ``save``. Files of an earlier split which are not part of this
+        one are left alone.
+
+        :arg out_dir: Directory of the files, it is created if needed.
+        :arg max_bytes: Size of the files to split again, in bytes.
+        :arg split_depth: Section depth of the files.
+        :arg workers: Number of threads writing the files.
+        :arg index: Name of the index file, without the extension.
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        self._check_spill('split')
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+        names = set([index])
+        head = [self._heading()]
+        top = []
+        paths = [os.path.join(out_dir, index + '.rst')]
+        pending = set()
+
+        def write(part):
+            for name, text in _split_part(part, max_bytes, top[-1], names):
+                data = text.encode('utf-8')
+                path = os.path.join(out_dir, name + '.rst')
+                paths.append(path)
+                pending.add(pool.submit(_write_file, path, [data], True,
+                                        False, len(data)))
+                # only a few rendered parts wait for a thread at once
+                while len(pending) > 2 * workers:
+                    done = wait(pending, return_when=FIRST_COMPLETED).done
+                    for future in done:
+                        future.result()
+                    pending.difference_update(done)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            part = None
+            for node, depth, text in self._iter_children(self.children):
+                section = None
+                if isinstance(node, Section):
+                    section = node._depth or depth
+                if section is not None and section <= split_depth:
+                    if part is not None:
+                        write(part)
+                    top.append(_unique_name(_slug(node._text), names))
+                    part = []
+                if part is None:
+                    head.append(text)
+                else:
+                    part.append((section, text))
+            if part is not None:
+                write(part)
+            if top:
+                head.append(_toctree(top))
+            data = u('').join(head).encode('utf-8')
+            pending.add(pool.submit(_write_file, paths[0], [data], True,
+                                    False, len(data)))
+            for future in pending:
+                future.result()
+        return paths
+
+    def write_to(self, fobj, workers=None):
+        """
+        Writes the rst representation of the document to the given file
+        object, one rendered child at a time, without building the whole
+        document in memory first.
+
+        :arg fobj: Text or binary file object, binary objects get utf-8.
+        :arg workers: Number of processes to render with, see ``get_rst``.
+        """
+        binary = _is_binary(fobj)
+        for chunk in self.iter_rst(workers):
+            if binary:
+                chunk = chunk.encode('utf-8')
+            fobj.write(chunk)
+
+    def iter_rst(self, workers=None, buffer_size=1 << 16):
+        """
+        Yields the rst representation of the document in unicode chunks,
+        the title first and then chunks of about ``buffer_size``
+        characters, rendered into a single reused buffer.
+
+        :arg workers: Number of processes to render with, see ``get_rst``.
+        :arg buffer_size: Number of characters collected before a chunk
+            is yielded.
+        """
+        yield self._heading()
+        for chunk in self._iter_spill():
+            yield chunk
+        if workers is not None and workers > 1:
+            for chunk in self._iter_parallel(workers):
+                yield chunk
+            return
+        if self.incremental:
+            # the fragments of the nodes are kept, only their joins are new
+            chunks = []
+            size = 0
+            for child, depth, text in self._iter_children(self.children):
+                chunks.append(text)
+                size += len(text)
+                if size >= buffer_size:
+                    yield u('').join(chunks)
+                    chunks = []
+                    size = 0
+            if chunks:
+                yield u('').join(chunks)
+            return
+        out = _new_buffer()
+        for child, depth in walk(self.children):
+            render_child(out, child, depth)
+            if out.tell() >= buffer_size:
+                yield out.getvalue()
+                out.seek(0)
+                out.truncate()
+        text = out.getvalue()
+        if text:
+            yield text
+
+    def _iter_children(self, children):
+        """
+        Yields ``(node, depth, rst)`` for ``children`` and the nodes below
+        them, in document order.
+        """
+        incremental = self.incremental
+        for child, depth in walk(children):
+            if incremental:
+                fragment = getattr(child, '_fragment', None)
+                if fragment is not None and fragment[0] == depth:
+                    yield child, depth, fragment[1]
+                    continue
+            out = _new_buffer()
+            render_child(out, child, depth)
+            text = out.getvalue()
+            if incremental:
+                _keep_fragments()
+                child._fragment = (depth, text)
+            yield child, depth, text
+
+    async def aiter_rst(self):
+        """
+        Asynchronous version of ``iter_rst``, it gives control back to the
+        event loop after every chunk.
+        """
+        import asyncio
+
+        for chunk in self.iter_rst():
+            yield chunk
+            await asyncio.sleep(0)
+
+    async def asave(self, path, buffer_size=1 << 16):
+        """
+        Asynchronous version of ``save``, it gives control back to the
+        event loop after every chunk and writes to the file in a thread.
+
+        :arg path: Path to save the document.
+        :arg buffer_size: Number of characters collected before a write.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        fobj = await loop.run_in_executor(
+            None, functools.partial(io.open, path, 'w', encoding='utf-8'))
+        try:
+            chunks = []
+            size = 0
+            async for chunk in self.aiter_rst():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= buffer_size:
+                    await loop.run_in_executor(None, fobj.write,
+                                               u('').join(chunks))
+                    chunks = []
+                    size = 0
+            if chunks:
+                await loop.run_in_executor(None, fobj.write, u('').join(chunks))
+        finally:
+            await loop.run_in_executor(None, fobj.close)
+
+    def _iter_parallel(self, workers):
+        """
+        Yields the rst of the children rendered in a process pool, in
+        document order.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        children = self.children
+        size = max(1, -(-len(children) // (workers * 4)))
+        chunks = [children[i:i + size] for i in range(0, len(children), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            render = functools.partial(_render_nodes, style=_heading_style)
+            for text in pool.map(render, chunks):
+                yield text
+
+    def compile(self):
+        """
+        Returns a ``Template`` of the document, see ``Placeholder``. The
+        nodes are rendered now, later changes of the document are not seen
+        by the template.
+
+        .. doctest::
+
+            >>> import rst
+            >>> doc = rst.Document('Report')
+            >>> doc.add_child(rst.Placeholder('summary'))
+            True
+            >>> template = doc.compile()
+            >>> print(template.fill(summary='All good.'))
+            ======
+            Report
+            ======
+            <BLANKLINE>
+            All good.
+            <BLANKLINE>
+            <BLANKLINE>
+        """
+        self._check_spill('compile')
+        parts = []
+        out = _new_buffer()
+        out.write(self._heading())
+        for child, depth in walk(self.children):
+            if isinstance(child, Placeholder):
+                parts.append(out.getvalue())
+                parts.append((child.name, depth, child.default))
+                out = _new_buffer()
+            else:
+                render_child(out, child, depth)
+        parts.append(out.getvalue())
+        return Template([part for part in parts if part != u('')])
+
+    def to_doctree(self, settings=None):
+        """
+        Returns the docutils document tree of the document, without
+        writing and parsing its rst, see ``rst.doctree.to_doctree``. Needs
+        docutils. Publish it with ``docutils.core.publish_from_doctree``.
+
+        :arg settings: docutils settings, the defaults of the rst parser if
+            ``None``.
+        """
+        from .doctree import to_doctree
+        self._check_spill('convert')
+        return to_doctree(self, settings)
 
+    def structure_hash(self):
+        """
+        Returns a stable hash of the title and of every node of the
+        document, or ``None`` if a node can not be hashed, see
+        ``Node.hash_parts``. Documents with the same hash render to the
+        same rst. Documents spilled to disk can not be hashed.
+        """
+        if self._spill is not None:
+            return None
+        digest = hashlib.sha1()
+        digest.update(repr((_HASH_VERSION, self._title, self._escape,
+                            _heading_style.levels)).encode('utf-8'))
+        names = {}
+        batch = []
+        for node, depth in walk(self.children):
+            kind = type(node)
+            name = names.get(kind)
+            if name is None:
+                renderer = get_renderer(kind)
+                name = names[kind] = '%s.%s:%s' % (
+                    kind.__module__, kind.__name__,
+                    getattr(renderer, '__qualname__', None))
+            try:
+                batch.append((name, depth, node.hash_parts()))
+            except (AttributeError, TypeError):
+                return None
+            if len(batch) == 1024:
+                digest.update(repr(batch).encode('utf-8'))
+                del batch[:]
+        digest.update(repr(batch).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_rst(self, workers=None, cache=None):
+        """
+        Returns the rst representation of the document in unicode format.
+
+        :arg workers: Number of processes to render with. The children are
+            split in chunks, which are pickled and rendered in a
+            ``concurrent.futures`` process pool, the output is the same as
+            the one of a serial render. Renderers registered with
+            ``register_renderer`` must be registered on import to be seen
+            by the workers, and tables reading from a cursor can not be
+            rendered in parallel.
+        :arg cache: ``RenderCache`` keeping the rst of documents by their
+            ``structure_hash``, documents which can not be hashed are
+            always rendered.
+        """
+        text = self._cached_rst(workers, cache)
+        if text is not None:
+            return text
+        if workers is not None and workers > 1:
+            return u('').join(self.iter_rst(workers))
+        if self.incremental:
+            fragment = self._fragment
+            key = (self._spilled, len(self.children))
+            if fragment is not None and fragment[0] == key:
+                return fragment[1]
+            text = u('').join(self.iter_rst())
+            _keep_fragments()
+            self._fragment = (key, text)
+            return text
+        out = _new_buffer()
+        self._write_nodes(out)
         return out.getvalue()
 
+    def _cached_rst(self, workers, cache):
+        """
+        Returns the rst of the document from ``cache``, rendering and
+        keeping it there first if needed. Returns ``None`` without a cache
+        or if the document can not be hashed.
+        """
+        if cache is None:
+            return None
+        key = self.structure_hash()
+        if key is None:
+            return None
+        text = cache.get(key)
+        if text is None:
+            text = self.get_rst(workers)
+            cache.put(key, text)
+        return text
+
+    def _write_nodes(self, out):
+        """
+        Writes the title and every node to the text buffer ``out``.
+        """
+        text = self._heading()
+        out.write(text)
+        for text in self._iter_spill():
+            out.write(text)
+        #Now goto each children, and their children
+        for child, depth in walk(self.children):
+            render_child(out, child, depth)
+
 
 class Node(object):
     """
     Returns a ``Node`` object.
 
-    Inherit this if you want to add something new to the API.
+    Inherit this if you want to add something new to the API, and
+    override ``render`` to write the rst of your node. The children of a
+    node are written after it, unless ``nested`` is ``False``.
+
+    Text of the nodes is escaped while rendering, see ``escape_text``,
+    unless ``escape`` is ``False``.
+
+    The nodes of this module use ``__slots__`` and leaf nodes never
+    allocate their ``children`` list, subclasses without ``__slots__`` get
+    a ``__dict__`` as usual.
     """
-    def __init__(self):
-        self.depth = 1
-        self.children = []
-        self.text = None
+    __slots__ = ('_depth', '_text', '_children', '_parent', '_fragment',
+                 '_escape')
+    nested = True
+    depth = _tracked('depth')
+    text = _tracked('text')
+    escape = _tracked('escape')
+
+    def __init__(self, escape=True):
+        self._depth = 1
+        self._children = None
+        self._text = None
+        self._parent = None
+        self._fragment = None
+        self._escape = escape
+
+    @property
+    def children(self):
+        """
+        List of the children of the node, allocated on first use.
+        """
+        if self._children is None:
+            self._children = []
+        return self._children
+
+    @children.setter
+    def children(self, value):
+        self._children = value
+        self.mark_dirty()
+
+    def __getstate__(self):
+        state = dict(getattr(self, '__dict__', ()))
+        for klass in type(self).__mro__:
+            for name in getattr(klass, '__slots__', ()):
+                if name not in ('_parent', '_fragment') and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        self._parent = None
+        self._fragment = None
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def hash_parts(self):
+        """
+        Returns the values deciding the rst of the node, for
+        ``Document.structure_hash``. The children nodes are hashed on their
+        own. Raises ``TypeError`` if the node can not be hashed.
+        """
+        state = self.__getstate__()
+        if self.nested:
+            state.pop('_children', None)
+        return sorted(state.items())
+
+    def mark_dirty(self):
+        """
+        Drops the cached rst of the node and of all the nodes above it, so
+        that an incremental ``Document`` renders it again.
+        """
+        if not _fragments_kept:
+            # no node holds any rst yet
+            return
+        node = self
+        while node is not None:
+            # the slots are unset before Node.__init__ ran
+            fragment = getattr(node, '_fragment', None)
+            if fragment is not None:
+                node._fragment = None
+                if type(fragment) is _Written:
+                    changed = getattr(node._parent, '_child_changed', None)
+                    if changed is not None:
+                        changed(fragment[2])
+            node = getattr(node, '_parent', None)
 
     def add_child(self, node):
         """
         Adds a ``Node`` object to the current.
         Returns ``True`` in case of success.
         """
-        self.children.append(node)
+        if self._children is None:
+            self._children = []
+        self._children.append(node)
+        if isinstance(node, Node):
+            node._parent = self
+        self.mark_dirty()
         return True
 
+    def child_depth(self, depth):
+        """
+        Returns the section depth of the children of this node.
+
+        :arg depth: Section depth of this node.
+        """
+        return depth
+
+    def render(self, out, depth=1):
+        """
+        Writes the rst representation of the node to ``out``.
+
+        Override this in your subclass, a plain ``Node`` writes nothing.
+
+        :arg out: File like object to write to.
+        :arg depth: Section depth at the position of the node.
+        """
+        pass
+
 
 class Paragraph(Node):
     """
     Represents a paragraph
 
     :arg text: Text to be present in the paragraph.
+    :arg intern: Intern the text, so that repeated texts are kept once.
 
     . doctest::
 
@@ -170,28 +2180,65 @@ class Paragraph(Node):
         <BLANKLINE>
         <BLANKLINE>
     """
-    def __init__(self, text=''):
-        Node.__init__(self)
-        self.text = text
+    __slots__ = ()
+
+    def __init__(self, text='', intern=False, escape=True):
+        Node.__init__(self, escape)
+        self._text = _intern(text) if intern else text
+
+    def hash_parts(self):
+        if type(self) is not Paragraph:
+            # subclasses may add state this tuple leaves out
+            return Node.hash_parts(self)
+        return (self._text, self._escape)
+
+    def render(self, out, depth=1):
+        text = self._text
+        if self._escape:
+            text = escape_text(text)
+        out.write(text + u('\n\n'))
 
 
 class Section(Node):
     """
     Represents a ``Section`` object.
     
-    :arg depth: Depth of the section, default is 1
+    :arg depth: Depth of the section, by default it is taken from the
+        nesting: 1 at the top of the document, one more than the enclosing
+        section for a child section.
     :arg text: Title of the section
+    :arg intern: Intern the title, so that repeated titles are kept once.
     """
-    def __init__(self, title, depth=1):
-        Node.__init__(self)
-        self.depth = depth
-        self.text = title
+    __slots__ = ()
+
+    def __init__(self, title, depth=None, intern=False, escape=True):
+        Node.__init__(self, escape)
+        self._depth = depth
+        self._text = _intern(title) if intern else title
+
+    def hash_parts(self):
+        if type(self) is not Section:
+            # subclasses may add state this tuple leaves out
+            return Node.hash_parts(self)
+        return (self._text, self._depth, self._escape)
+
+    def render(self, out, depth=1):
+        text = self._text
+        if self._escape:
+            text = escape_text(text)
+        out.write(create_section(text, self._depth or depth))
+
+    def child_depth(self, depth):
+        return (self._depth or depth) + 1
 
 
 class Bulletlist(Node):
     """
     Represents a Bullet List.
 
+    :arg items: Iterable of more items, only consumed when the list is
+        rendered. A generator can only be rendered once.
+
     .. doctest::
 
         >>> import rst
@@ -212,8 +2259,30 @@ class Bulletlist(Node):
         <BLANKLINE>
 
     """
-    def __init__(self):
-        Node.__init__(self)
+    __slots__ = ('_source',)
+    nested = False
+    source = _tracked('source')
+
+    def __init__(self, items=None, escape=True):
+        Node.__init__(self, escape)
+        self._children = []
+        self._source = items
+
+    def iter_items(self):
+        """
+        Yields the items of the list, the ones from ``source`` first.
+        """
+        if self._source is None:
+            return iter(self._children)
+        return itertools.chain(self._source, self._children)
+
+    def hash_parts(self):
+        if type(self) is not Bulletlist:
+            # subclasses may add state this tuple leaves out
+            return Node.hash_parts(self)
+        if not isinstance(self.source, (type(None), list, tuple, range)):
+            raise TypeError('Can not hash the items of %r' % self.source)
+        return (self.source, self._children, self._escape)
 
     def add_item(self, text):
         """
@@ -221,13 +2290,21 @@ class Bulletlist(Node):
 
         :arg text: text to be added in the list.
         """
-        self.children.append(text)
+        self._children.append(text)
+        self.mark_dirty()
+
+    def render(self, out, depth=1):
+        print_items(out, self.iter_items(), escape=self._escape)
+        out.write(u('\n'))
 
 
 class Orderedlist(Node):
     """
     Represents a Ordered List.
 
+    :arg items: Iterable of more items, only consumed when the list is
+        rendered. A generator can only be rendered once.
+
     .. doctest::
 
         >>> import rst
@@ -248,8 +2325,30 @@ class Orderedlist(Node):
         <BLANKLINE>
 
     """
-    def __init__(self):
-        Node.__init__(self)
+    __slots__ = ('_source',)
+    nested = False
+    source = _tracked('source')
+
+    def __init__(self, items=None, escape=True):
+        Node.__init__(self, escape)
+        self._children = []
+        self._source = items
+
+    def iter_items(self):
+        """
+        Yields the items of the list, the ones from ``source`` first.
+        """
+        if self._source is None:
+            return iter(self._children)
+        return itertools.chain(self._source, self._children)
+
+    def hash_parts(self):
+        if type(self) is not Orderedlist:
+            # subclasses may add state this tuple leaves out
+            return Node.hash_parts(self)
+        if not isinstance(self.source, (type(None), list, tuple, range)):
+            raise TypeError('Can not hash the items of %r' % self.source)
+        return (self.source, self._children, self._escape)
 
     def add_item(self, text):
         """
@@ -257,13 +2356,32 @@ class Orderedlist(Node):
 
         :arg text: text to be added in the list, remember it is ordered list.
         """
-        self.children.append(text)
+        self._children.append(text)
+        self.mark_dirty()
+
+    def render(self, out, depth=1):
+        print_items(out, self.iter_items(), ordered=True,
+                    escape=self._escape)
+        out.write(u('\n'))
 
 
 class Table(Node):
     """
     Represents a Table, (will be wriiten in csv-table style)
 
+    ``format`` can be ``'list'`` for a ``list-table``, ``'grid'`` for a
+    grid table or ``'simple'`` for a simple table. A simple table is much
+    smaller than a ``list-table`` for many short cells, a grid table is
+    larger, it has a border line under every row. The cells of both are
+    written on a single line and all the rows are kept in memory while
+    rendering.
+
+    By default every row is kept as a list in ``children``. With
+    ``columnar=True`` the cells are kept per column in ``columns``
+    instead, which needs far less memory for tables with many rows.
+    ``source`` can be a callable returning more rows at render time, see
+    ``from_csv``, ``from_array`` and ``from_cursor``.
+
     .. doctest::
 
         >>> import rst
@@ -293,11 +2411,120 @@ class Table(Node):
         <BLANKLINE>
 
     """
-    def __init__(self, title='', header=None, width=None):
-        Node.__init__(self)
-        self.text = title
-        self.header = header
-        self.width = width
+    __slots__ = ('_header', '_width', '_format', '_columns', '_source')
+    nested = False
+    header = _tracked('header')
+    width = _tracked('width')
+    format = _tracked('format')
+    columns = _tracked('columns')
+    source = _tracked('source')
+
+    def __init__(self, title='', header=None, width=None, columnar=False,
+                 escape=True, format='list'):
+        Node.__init__(self, escape)
+        self._children = []
+        self._text = title
+        self._header = header
+        self._width = width
+        self._format = format
+        self._columns = [] if columnar else None
+        self._source = None
+
+    @classmethod
+    def from_columns(cls, title='', header=None, columns=(), width=None,
+                     escape=True, format='list'):
+        """
+        Returns a columnar ``Table`` holding the given columns.
+
+        :arg columns: list of columns, each one a list of cells.
+        :arg escape: Escape the text of the table, see ``Node``.
+        :arg format: Format of the table, see ``Table``.
+        """
+        table = cls(title, header, width, columnar=True, escape=escape,
+                    format=format)
+        table.columns = [list(col) for col in columns]
+        if len(set(len(col) for col in table.columns)) > 1:
+            raise ValueError('All the columns must have the same length')
+        return table
+
+    @classmethod
+    def from_csv(cls, path, title='', header=True, width=None,
+                 encoding='utf-8', escape=True, format='list', **fmtparams):
+        """
+        Returns a ``Table`` which reads its rows from a CSV file while the
+        document is rendered, the rows are never kept in memory.
+
+        :arg path: Path of the CSV file, it is read again on every render.
+        :arg header: ``True`` to take the header from the first line of
+            the file, or the header itself.
+        :arg encoding: Encoding of the file.
+        :arg escape: Escape the text of the table, see ``Node``.
+        :arg format: Format of the table, see ``Table``.
+        :arg fmtparams: Passed to ``csv.reader``.
+        """
+        skip = 0
+        if header is True:
+            with _open_csv(path, encoding) as fobj:
+                for header in csv.reader(fobj, **fmtparams):
+                    break
+                else:
+                    header = None
+            skip = 1
+
+        table = cls(title, header, width, escape=escape, format=format)
+        table.source = _CSVRows(path, encoding, skip, fmtparams)
+        return table
+
+    @classmethod
+    def from_array(cls, array, title='', header=None, width=None,
+                   escape=True, format='list'):
+        """
+        Returns a ``Table`` which renders the rows of a 2-D NumPy array, or
+        of a structured array, without copying it.
+
+        :arg array: The array, for a structured array the field names are
+            the default header.
+        :arg escape: Escape the text of the table, see ``Node``.
+        :arg format: Format of the table, see ``Table``.
+        """
+        names = array.dtype.names
+        if names is None and array.ndim != 2:
+            raise ValueError('Expected a 2-D or a structured array')
+        if header is None and names is not None:
+            header = list(names)
+
+        table = cls(title, header, width, escape=escape, format=format)
+        table.source = _ArrayRows(array)
+        return table
+
+    @classmethod
+    def from_cursor(cls, cursor, title='', header=None, width=None,
+                    size=1000, escape=True, format='list'):
+        """
+        Returns a ``Table`` which fetches its rows from a DB-API cursor
+        while the document is rendered. A cursor can only be read once, so
+        the document can only be rendered once too.
+
+        :arg cursor: Cursor of an executed query, the column names are the
+            default header.
+        :arg size: Number of rows to fetch at once.
+        :arg escape: Escape the text of the table, see ``Node``.
+        :arg format: Format of the table, see ``Table``.
+        """
+        if header is None and cursor.description:
+            header = [col[0] for col in cursor.description]
+
+        def rows():
+            while True:
+                chunk = cursor.fetchmany(size)
+                if not chunk:
+                    break
+                for row in chunk:
+                    yield row
+
+        table = cls(title, header, width, escape=escape, format=format)
+        table.source = rows
+        return table
 
     def add_item(self, row):
         """
@@ -305,7 +2532,111 @@ class Table(Node):
 
         :arg row: list of items in the table.
         """
-        self.children.append([txt for txt in row])
+        if self._columns is None:
+            self._children.append([txt for txt in row])
+            self.mark_dirty()
+        else:
+            self.add_rows((row,))
+
+    def add_rows(self, rows):
+        """
+        Adds many rows to the table at once.
+
+        :arg rows: Iterable of rows, each row a list of items.
+        """
+        self.mark_dirty()
+        if self._columns is None:
+            self._children.extend([txt for txt in row] for row in rows)
+            return
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, 4096))
+            if not chunk:
+                break
+            if not self._columns:
+                self._columns = [[] for txt in chunk[0]]
+            width = len(self._columns)
+            for row in chunk:
+                if len(row) != width:
+                    raise ValueError('Expected %d items in the row, got %d'
+                                     % (width, len(row)))
+            for col, cells in zip(self._columns, zip(*chunk)):
+                col.extend(cells)
+
+    def iter_rows(self):
+        """
+        Yields the rows of the table, the ones from ``source`` first.
+        """
+        if self.columns is None:
+            rows = iter(self._children)
+        else:
+            rows = zip(*self.columns)
+        if self.source is not None:
+            rows = itertools.chain(self.source(), rows)
+        return rows
+
+    def _render_table(self, out, title):
+        """
+        Writes the table as a grid or simple table in a table directive.
+        """
+        if self._format == 'grid':
+            printer = print_grid
+        elif self._format == 'simple':
+            printer = print_simple
+        else:
+            raise ValueError('Unknown table format %r' % self._format)
+        rows = list(self.iter_rows())
+        width = max([len(row) for row in rows] + [len(self._header or ())])
+        if not width:
+            return
+        header = None
+        if self._header:
+            header = _table_columns([self._header], width, self._escape)
+            header = [col[0] for col in header]
+        columns = _table_columns(rows, width, self._escape)
+        del rows
+        if not columns:
+            columns = [[] for index in range(width)]
+        if printer is print_simple and columns:
+            first = columns[0]
+            for index in _simple_guard(first):
+                first[index] = _simple_cell([col[index] for col in columns])
+            if header and _simple_guard(header[:1]):
+                header[0] = _simple_cell(header)
+        # the widths are measured on the columns, not on the rows again
+        widths = [_max_width(col) for col in columns]
+        if header:
+            widths = [max(w, column_width(cell))
+                      for w, cell in zip(widths, header)]
+        out.write(u('.. table:: %s\n\n') % title)
+        printer(out, header, list(zip(*columns)), widths=widths)
+        out.write(u('\n'))
+
+    def hash_parts(self):
+        if type(self) is not Table:
+            # subclasses may add state this tuple leaves out
+            return Node.hash_parts(self)
+        source = None
+        if self.source is not None:
+            # raises AttributeError for sources without a key
+            source = self.source.hash_key()
+        return (self._text, self._header, self._width, self._children,
+                self.columns, source, self._escape, self._format)
+
+    def render(self, out, depth=1):
+        escape = self._escape
+        title = escape_text(self._text) if escape else self._text
+        if self._format != 'list':
+            self._render_table(out, title)
+            return
+        out.write(u('.. list-table:: %s\n') % title)
+        if self._width:
+            out.write(u('    %s') % self._width)
+        if self._header:
+            out.write(u('    :header-rows: 1\n\n'))
+            print_table(out, self._header, escape)
+        print_rows(out, self.iter_rows(), escape=escape)
+        out.write(u('\n'))
 
 
 class CodeBlock(Node):
@@ -330,13 +2661,114 @@ class CodeBlock(Node):
             import sys
             sys.stdout.write('Working')
         <BLANKLINE>
+        <BLANKLINE>
 
     """
+    __slots__ = ('_code', '_lang', '_linenos', '_path', '_lines', '_encoding')
+    code = _tracked('code')
+    lang = _tracked('lang')
+    linenos = _tracked('linenos')
+    path = _tracked('path')
+    lines = _tracked('lines')
+    encoding = _tracked('encoding')
+
     def __init__(self, code, lang='', linenos=False):
         Node.__init__(self)
-        self.code = code
-        self.lang = lang
-        self.linenos = linenos
+        self._code = code
+        self._lang = lang
+        self._linenos = linenos
+        self._path = None
+        self._lines = None
+        self._encoding = None
+
+    @classmethod
+    def from_file(cls, path, lang='', linenos=False, lines=None,
+                  encoding='utf-8'):
+        """
+        Returns a ``CodeBlock`` which reads its code from a file while the
+        document is rendered, the file is streamed in chunks of lines and
+        never kept in memory.
+
+        :arg path: Path of the file, it is read again on every render.
+        :arg lines: ``(first, last)`` line numbers to include, counting
+            from 1 as ``literalinclude`` does, ``last`` can be ``None``.
+        :arg encoding: Encoding of the file.
+        """
+        if lines is not None:
+            first, last = lines
+            if first < 1 or (last is not None and last < first):
+                raise ValueError('Expected lines (first, last) with '
+                                 '1 <= first <= last, got %r' % (lines,))
+        block = cls(None, lang, linenos)
+        block._path = path
+        block._lines = lines
+        block._encoding = encoding
+        return block
+
+    def render(self, out, depth=1):
+        out.write(u('.. code-block:: %s\n') % self._lang)
+        if self._linenos:
+            out.write(u('    :linenos:\n'))
+        # the content is separated from the directive and the next node
+        out.write(u('\n'))
+        if self._path is not None:
+            self._render_file(out)
+        else:
+            out.write(u('    ') + self._code.replace(u('\n'), u('\n    ')) + u('\n'))
+        out.write(u('\n'))
+
+    def hash_parts(self):
+        stat = None
+        if self._path is not None:
+            stat = os.stat(self._path)
+            stat = (stat.st_mtime, stat.st_size)
+        if type(self) is not CodeBlock:
+            # subclasses may add state this tuple leaves out
+            return Node.hash_parts(self) + [('stat', stat)]
+        return (self._code, self._lang, self._linenos, self._path,
+                self._lines, self._encoding, stat)
+
+    def _render_file(self, out, batch=1024):
+        """
+        Writes the indented lines of ``path`` to ``out``.
+        """
+        first, last = self._lines or (1, None)
+        with io.open(self._path, encoding=self._encoding) as fobj:
+            lines = itertools.islice(fobj, first - 1, last)
+            while True:
+                chunk = list(itertools.islice(lines, batch))
+                if not chunk:
+                    break
+                if not chunk[-1].endswith(u('\n')):
+                    chunk[-1] += u('\n')
+                out.write(u('    ') + u('    ').join(chunk))
+
+
+class Placeholder(Node):
+    """
+    Marks the place of nodes given when the template of a document is
+    filled, see ``Document.compile`` and ``Template.fill``.
+
+    :arg name: Name of the value in ``Template.fill``.
+    :arg default: Value used when none is given, a document rendered
+        without compiling it writes the default.
+    """
+    __slots__ = ('name', 'default')
+    nested = False
+
+    def __init__(self, name, default=None):
+        Node.__init__(self)
+        self.name = name
+        self.default = default
+
+    def hash_parts(self):
+        if not isinstance(self.default, (type(None), str, text_type)):
+            raise TypeError('Can not hash the default of %r' % self.name)
+        return (self.name, self.default)
+
+    def render(self, out, depth=1):
+        if self.default is not None:
+            _render_value(out, self.default, depth)
 
 
 if __name__ == '__main__':
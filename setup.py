@@ -38,15 +38,18 @@ setup(name='rst',
           'Topic :: Software Development :: Libraries',
           'License :: OSI Approved :: MIT License',
           'Topic :: System :: Distributed Computing',
-          'Programming Language :: Python :: 2.6',
-          'Programming Language :: Python :: 2.7',
-          'Programming Language :: Python :: 3.2'
+          'Programming Language :: Python :: 3',
+          'Programming Language :: Python :: 3 :: Only'
           ],
+      python_requires='>=3.7',
       packages=find_packages(),
       data_files=[],
       install_requires=[
           'six'
       ],
+      extras_require={
+          'doctree': ['docutils']
+      },
       test_suite='tests',
       tests_require=[
           'mock'
@@ -18,13 +18,37 @@
 #OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 #SOFTWARE.
 
-import rst
+import asyncio
+import io
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
 import unittest
+
+import rst
 from six import u
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    from docutils.core import publish_doctree
+except ImportError:
+    publish_doctree = None
+
 
 class RstTest(unittest.TestCase):
 
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
     def test_title(self):
         "test the title of the document"
         doc = rst.Document(u("Sample document"))
@@ -73,9 +97,889 @@ Sample document
         code = rst.CodeBlock("import sys", lang="python", linenos=True)
         doc.add_child(code)
         text = doc.get_rst()
-        actual_text = u('=\nT\n=\n\n.. code-block:: python\n    :linenos:\n\n    import sys\n')
+        actual_text = u('=\nT\n=\n\n.. code-block:: python\n    :linenos:\n\n    import sys\n\n')
+        self.assertEqual(text, actual_text)
+
+
+    def test_write_to(self):
+        "test streaming the document to text and binary file objects"
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Paragraph(u('Caf\xe9')))
+        text = doc.get_rst()
+        tobj = io.StringIO()
+        doc.write_to(tobj)
+        self.assertEqual(tobj.getvalue(), text)
+        bobj = io.BytesIO()
+        doc.write_to(bobj)
+        self.assertEqual(bobj.getvalue(), text.encode('utf-8'))
+        self.assertEqual(u('').join(doc.iter_rst()), text)
+        for i in range(5):
+            doc.add_child(rst.Paragraph(u('More %d') % i))
+        text = doc.get_rst()
+        for incremental in (False, True):
+            doc.incremental = incremental
+            chunks = list(doc.iter_rst(buffer_size=16))
+            self.assertEqual(u('').join(chunks), text)
+            self.assertTrue(3 < len(chunks) < 8)
+
+    def test_save(self):
+        "test saving the document to a file"
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Paragraph(u('Caf\xe9')))
+        path = os.path.join(self.tmpdir, 'doc.rst')
+        doc.save(path)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), doc.get_rst())
+
+
+    def test_custom_node(self):
+        "test rendering of a user defined Node subclass"
+        class Note(rst.Node):
+            def __init__(self, text):
+                rst.Node.__init__(self)
+                self.text = text
+
+            def render(self, out, depth=1):
+                out.write(u('.. note:: {}\n\n').format(self.text))
+
+        doc = rst.Document(u("T"))
+        doc.add_child(Note(u('Read me')))
+        text = doc.get_rst()
+        self.assertEqual(text, u('=\nT\n=\n\n.. note:: Read me\n\n'))
+
+    def test_register_renderer(self):
+        "test overriding the renderer of a node type"
+        class Quote(rst.Paragraph):
+            pass
+
+        def render_quote(node, out, depth):
+            out.write(u('    {}\n\n').format(node.text))
+
+        rst.register_renderer(Quote, render_quote)
+        doc = rst.Document(u("T"))
+        doc.add_child(Quote(u('Quoted')))
+        doc.add_child(rst.Paragraph(u('Plain')))
+        text = doc.get_rst()
+        self.assertEqual(text, u('=\nT\n=\n\n    Quoted\n\nPlain\n\n'))
+        doc.add_child(u('not a node'))
+        self.assertRaises(TypeError, doc.get_rst)
+
+
+    def test_nested_sections(self):
+        "test rendering of children of a Section"
+        doc = rst.Document(u("T"))
+        sec = rst.Section(u('One'), 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Paragraph(u('Text')))
+        sub = rst.Section(u('Two'))
+        sec.add_child(sub)
+        sub.add_child(rst.Paragraph(u('More')))
+        doc.add_child(rst.Section(u('Three'), 2))
+        text = doc.get_rst()
+        actual_text = u('=\nT\n=\n\n\nOne\n---\n\nText\n\n'
+                        '\nTwo\n+++\n\nMore\n\n\nThree\n-----\n\n')
         self.assertEqual(text, actual_text)
 
+    def test_deep_tree(self):
+        "test rendering of a tree deeper than the recursion limit"
+        doc = rst.Document(u("T"))
+        node = doc
+        for i in range(5000):
+            child = rst.Node()
+            node.add_child(child)
+            node = child
+        node.add_child(rst.Paragraph(u('Bottom')))
+        self.assertEqual(doc.get_rst(), u('=\nT\n=\n\nBottom\n\n'))
+
+    def test_too_deep_section(self):
+        "test that sections deeper than the adornments raise ValueError"
+        doc = rst.Document(u("T"))
+        node = doc
+        for i in range(14):
+            child = rst.Section(u('S%d') % i)
+            node.add_child(child)
+            node = child
+        with self.assertRaises(ValueError) as ctx:
+            doc.get_rst()
+        self.assertIn('14', str(ctx.exception))
+        self.assertIn('13 levels', str(ctx.exception))
+
+
+    def test_columnar_table(self):
+        "test that a columnar Table renders like a row based one"
+        rows = [(u('Ramki'), u('Python')), (u('Pradeepto'), u('Kde'))]
+        header = [u('Name'), u('Major Project')]
+        tbl = rst.Table(u('My friends'), header)
+        for row in rows:
+            tbl.add_item(row)
+        col = rst.Table(u('My friends'), header, columnar=True)
+        col.add_rows(rows)
+        fromcol = rst.Table.from_columns(u('My friends'), header,
+                                         [[u('Ramki'), u('Pradeepto')],
+                                          [u('Python'), u('Kde')]])
+        texts = []
+        for table in (tbl, col, fromcol):
+            doc = rst.Document(u("T"))
+            doc.add_child(table)
+            texts.append(doc.get_rst())
+        self.assertEqual(texts[0], texts[1])
+        self.assertEqual(texts[0], texts[2])
+        self.assertEqual(col.children, [])
+        self.assertRaises(ValueError, col.add_item, (u('Nicubunu'),))
+
+    def test_table_empty_cells(self):
+        "test that rows of empty cells are written and empty rows are not"
+        tbl = rst.Table(u('T'), [u('Name')])
+        tbl.add_item([u('')])
+        tbl.add_item([])
+        tbl.add_item([u('Kde')])
+        doc = rst.Document(u("T"))
+        doc.add_child(tbl)
+        self.assertEqual(doc.get_rst(), u(
+            '=\nT\n=\n\n.. list-table:: T\n    :header-rows: 1\n\n'
+            '    * -  Name\n    * -  \n    * -  Kde\n\n'))
+
+
+    def test_table_sources(self):
+        "test Tables reading their rows from a CSV file and a cursor"
+        expected = u('=\nT\n=\n\n.. list-table:: F\n    :header-rows: 1\n\n'
+                     '    * -  Name\n      -  Age\n'
+                     '    * -  Ramki\n      -  30\n'
+                     '    * -  Kushal\n      -  31\n\n')
+        path = os.path.join(self.tmpdir, 'friends.csv')
+        with open(path, 'w') as fobj:
+            fobj.write('Name,Age\nRamki,30\nKushal,31\n')
+        doc = rst.Document(u("T"))
+        tbl = rst.Table.from_csv(path, u('F'))
+        doc.add_child(tbl)
+        self.assertEqual(doc.get_rst(), expected)
+        self.assertEqual(tbl.children, [])
+
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE friends (Name TEXT, Age INTEGER)')
+        conn.executemany('INSERT INTO friends VALUES (?, ?)',
+                         [('Ramki', 30), ('Kushal', 31)])
+        cursor = conn.execute('SELECT Name, Age FROM friends')
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Table.from_cursor(cursor, u('F'), size=1))
+        self.assertEqual(doc.get_rst(), expected)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_table_from_array(self):
+        "test a Table reading its rows from a structured array"
+        arr = numpy.array([('Ramki', 30), ('Kushal', 31)],
+                          dtype=[('Name', 'U10'), ('Age', 'i4')])
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Table.from_array(arr, u('F')))
+        self.assertTrue(doc.get_rst().endswith(
+            u('    * -  Name\n      -  Age\n    * -  Ramki\n      -  30\n'
+              '    * -  Kushal\n      -  31\n\n')))
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Table.from_array(numpy.arange(4).reshape(2, 2)))
+        self.assertTrue(doc.get_rst().endswith(
+            u('    * -  0\n      -  1\n    * -  2\n      -  3\n\n')))
+        self.assertRaises(ValueError, rst.Table.from_array, numpy.arange(4))
+
+
+    def test_incremental(self):
+        "test that an incremental Document renders the changed nodes again"
+        doc = rst.Document(u("T"), incremental=True)
+        sec = rst.Section(u('One'), 2)
+        doc.add_child(sec)
+        para = rst.Paragraph(u('Text'))
+        sec.add_child(para)
+        blt = rst.Bulletlist()
+        blt.add_item(u('Fedora'))
+        doc.add_child(blt)
+        text = doc.get_rst()
+        self.assertEqual(text, u('=\nT\n=\n\n\nOne\n---\n\nText\n\n'
+                                 '    * Fedora\n\n'))
+        self.assertTrue(doc.get_rst() is text)
+        para.text = u('Changed')
+        blt.add_item(u('Debian'))
+        text = doc.get_rst()
+        self.assertEqual(text, u('=\nT\n=\n\n\nOne\n---\n\nChanged\n\n'
+                                 '    * Fedora\n    * Debian\n\n'))
+        doc.title = u('X')
+        self.assertTrue(doc.get_rst().startswith(u('=\nX\n=\n')))
+        tbl = rst.Table(u('F'), [u('A')], columnar=True)
+        tbl.add_item([u('a')])
+        doc.add_child(tbl)
+        self.assertTrue(doc.get_rst().endswith(u('    * -  a\n\n')))
+        tbl.columns = [[u('b')]]
+        self.assertTrue(doc.get_rst().endswith(u('    * -  b\n\n')))
+        tbl.source = lambda: iter([[u('c')]])
+        self.assertTrue(doc.get_rst().endswith(u('    * -  c\n    * -  b\n\n')))
+        blt.source = [u('Arch')]
+        self.assertIn(u('    * Arch\n    * Fedora\n    * Debian\n'),
+                      doc.get_rst())
+
+
+    def test_parallel(self):
+        "test that a parallel render gives the same output as a serial one"
+        doc = rst.Document(u("T"))
+        for i in range(20):
+            sec = rst.Section(u('Section %d') % i, 2)
+            doc.add_child(sec)
+            sec.add_child(rst.Paragraph(u('Paragraph %d') % i))
+            tbl = rst.Table(u('Table %d') % i, [u('A'), u('B')])
+            tbl.add_item((u('a%d') % i, u('b%d') % i))
+            sec.add_child(tbl)
+        text = doc.get_rst()
+        self.assertEqual(doc.get_rst(workers=2), text)
+        path = os.path.join(self.tmpdir, 'doc.rst')
+        doc.save(path, workers=2)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), text)
+
+
+    def test_render_many(self):
+        "test saving many documents in one go"
+        docs = []
+        for i in range(5):
+            doc = rst.Document(u('Report %d') % i)
+            doc.add_child(rst.Paragraph(u('Caf\xe9 %d') % i))
+            docs.append(('report%d.rst' % i, doc))
+        for workers, executor in ((None, 'thread'), (2, 'thread'),
+                                  (2, 'process')):
+            outdir = os.path.join(self.tmpdir, '%s-%s' % (workers, executor))
+            stats = rst.render_many(docs, outdir, workers, executor)
+            self.assertEqual(len(stats), 5)
+            for (name, doc), stat in zip(docs, stats):
+                self.assertEqual(stat.path, os.path.join(outdir, name))
+                with io.open(stat.path, encoding='utf-8') as fobj:
+                    self.assertEqual(fobj.read(), doc.get_rst())
+                self.assertEqual(stat.size, os.path.getsize(stat.path))
+
+
+    def test_heading_style(self):
+        "test custom heading styles and the heading cache"
+        rst.set_section_cache_size(16)
+        try:
+            rst.set_heading_style(rst.HeadingStyle(u('#*='), overline=(1, 2)))
+            doc = rst.Document(u("T"))
+            doc.add_child(rst.Section(u('One')))
+            doc.add_child(rst.Section(u('Two'), 3))
+            doc.add_child(rst.Section(u('Two'), 3))
+            text = doc.get_rst()
+            info = rst.section_cache_info()
+        finally:
+            rst.set_heading_style()
+            rst.set_section_cache_size(4096)
+        actual_text = u('#\nT\n#\n\n###\nOne\n###\n\n\nTwo\n===\n\n'
+                        '\nTwo\n===\n\n')
+        self.assertEqual(text, actual_text)
+        self.assertEqual((info.hits, info.misses, info.maxsize), (1, 3, 16))
+        self.assertEqual(rst.create_section(u('T'), 2), u('\nT\n-\n\n'))
+        self.assertEqual(rst.section_cache_info().maxsize, 4096)
+
+
+    def test_heading_style_workers(self):
+        "test that worker processes started with spawn use the heading style"
+        import multiprocessing
+        method = multiprocessing.get_start_method(allow_none=True)
+        multiprocessing.set_start_method('spawn', force=True)
+        try:
+            rst.set_heading_style(rst.HeadingStyle(u('#*=~')))
+            doc = rst.Document(u("T"))
+            for i in range(4):
+                doc.add_child(rst.Section(u('Section %d') % i, 2))
+            text = doc.get_rst()
+            self.assertTrue(u('*********') in text)
+            self.assertEqual(doc.get_rst(workers=2), text)
+            stats = rst.render_many([('doc.rst', doc)], self.tmpdir, 2,
+                                    'process')
+            with io.open(stats[0].path, encoding='utf-8') as fobj:
+                self.assertEqual(fobj.read(), text)
+        finally:
+            rst.set_heading_style()
+            multiprocessing.set_start_method(method, force=True)
+
+
+    def test_slots(self):
+        "test the compact layout of the nodes"
+        para = rst.Paragraph(u('Text'), intern=True)
+        self.assertFalse(hasattr(para, '__dict__'))
+        self.assertEqual(para._children, None)
+        self.assertEqual(para.children, [])
+        self.assertEqual(para.text, u('Text'))
+        self.assertEqual(para.depth, 1)
+        sec = rst.Section(u('One'), 2)
+        sec.add_child(para)
+        copy = pickle.loads(pickle.dumps(sec))
+        self.assertEqual(copy.text, u('One'))
+        self.assertEqual(copy.children[0].text, u('Text'))
+
+        class Early(rst.Paragraph):
+            def __init__(self, text):
+                self.text = text
+                rst.Node.__init__(self)
+                self.text = text
+
+        doc = rst.Document(u("T"))
+        doc.add_child(Early(u('Early')))
+        self.assertEqual(doc.get_rst(), u('=\nT\n=\n\nEarly\n\n'))
+
+
+    def test_lazy_lists(self):
+        "test lists taking their items from a generator"
+        doc = rst.Document(u("T"))
+        blt = rst.Bulletlist(u('Item %d') % i for i in range(3))
+        blt.add_item(u('Last'))
+        doc.add_child(blt)
+        doc.add_child(rst.Orderedlist(range(9, 12)))
+        text = doc.get_rst()
+        actual_text = u('=\nT\n=\n\n    * Item 0\n    * Item 1\n    * Item 2\n'
+                        '    * Last\n\n    1. 9\n    2. 10\n    3. 11\n\n')
+        self.assertEqual(text, actual_text)
+        self.assertEqual(blt.children, [u('Last')])
+
+
+    def test_codeblock_from_file(self):
+        "test a CodeBlock streaming its code from a file"
+        path = os.path.join(self.tmpdir, 'code.py')
+        with open(path, 'w') as fobj:
+            fobj.write('import os\nimport sys\n\nprint(sys.argv)')
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.CodeBlock.from_file(path, lang='python'))
+        doc.add_child(rst.CodeBlock.from_file(path, lines=(2, 2)))
+        text = doc.get_rst()
+        actual_text = u('=\nT\n=\n\n.. code-block:: python\n\n    import os\n'
+                        '    import sys\n    \n    print(sys.argv)\n\n'
+                        '.. code-block:: \n\n    import sys\n\n')
+        self.assertEqual(text, actual_text)
+        self.assertRaises(ValueError, rst.CodeBlock.from_file, path,
+                          lines=(0, 2))
+        doc = rst.Document(u("T"), incremental=True)
+        block = rst.CodeBlock.from_file(path, lines=(1, 1))
+        doc.add_child(block)
+        self.assertTrue(doc.get_rst().endswith(u('    import os\n\n')))
+        block.lines = (2, 2)
+        self.assertTrue(doc.get_rst().endswith(u('    import sys\n\n')))
+
+
+    def test_async(self):
+        "test rendering and saving the document from asyncio"
+        doc = rst.Document(u("T"))
+        for i in range(3):
+            doc.add_child(rst.Paragraph(u('Caf\xe9 %d') % i))
+        path = os.path.join(self.tmpdir, 'doc.rst')
+
+        async def run():
+            chunks = [chunk async for chunk in doc.aiter_rst()]
+            await doc.asave(path, buffer_size=8)
+            return u('').join(chunks)
+
+        loop = asyncio.new_event_loop()
+        try:
+            text = loop.run_until_complete(run())
+            with io.open(path, encoding='utf-8') as fobj:
+                saved = fobj.read()
+        finally:
+            loop.close()
+        self.assertEqual(text, doc.get_rst())
+        self.assertEqual(saved, text)
+
+
+    def test_render_cache(self):
+        "test keeping rendered documents by their structure hash"
+        def build(text):
+            doc = rst.Document(u("T"))
+            sec = rst.Section(u('One'), 2)
+            doc.add_child(sec)
+            sec.add_child(rst.Paragraph(text))
+            tbl = rst.Table(u('F'), [u('A')])
+            tbl.add_item([u('a')])
+            doc.add_child(tbl)
+            return doc
+
+        doc = build(u('Text'))
+        self.assertEqual(doc.structure_hash(), build(u('Text')).structure_hash())
+        self.assertNotEqual(doc.structure_hash(),
+                            build(u('Other')).structure_hash())
+        doc.add_child(rst.Bulletlist(iter([u('lazy')])))
+        self.assertEqual(doc.structure_hash(), None)
+        cache = rst.RenderCache(os.path.join(self.tmpdir, 'cache'),
+                                max_bytes=100)
+        doc = build(u('Text'))
+        text = doc.get_rst(cache=cache)
+        self.assertEqual(text, doc.get_rst())
+        self.assertEqual(cache.get(doc.structure_hash()), text)
+        path = os.path.join(self.tmpdir, 'doc.rst')
+        build(u('Text')).save(path, cache=cache)
+        mtime = os.path.getmtime(path)
+        os.utime(path, (mtime - 100, mtime - 100))
+        build(u('Text')).save(path, cache=cache)
+        self.assertEqual(os.path.getmtime(path), mtime - 100)
+        build(u('x' * 200)).get_rst(cache=cache)
+        self.assertEqual(cache.get(doc.structure_hash()), None)
+        # the state subclasses add is hashed too
+        class Note(rst.Paragraph):
+            __slots__ = ('kind',)
+
+            def __init__(self, text, kind):
+                rst.Paragraph.__init__(self, text)
+                self.kind = kind
+
+            def render(self, out, depth=1):
+                out.write(u('.. %s::\n\n    %s\n\n') % (self.kind, self.text))
+
+        docs = []
+        for kind in (u('note'), u('warning')):
+            docs.append(rst.Document(u("T")))
+            docs[-1].add_child(Note(u('Text'), kind))
+        self.assertNotEqual(docs[0].structure_hash(), docs[1].structure_hash())
+        cache = rst.RenderCache(os.path.join(self.tmpdir, 'notes'))
+        self.assertIn(u('note'), docs[0].get_rst(cache=cache))
+        self.assertIn(u('warning'), docs[1].get_rst(cache=cache))
+
+
+    def test_save_skip_unchanged(self):
+        "test that unchanged files are not written and atomic saves"
+        path = os.path.join(self.tmpdir, 'doc.rst')
+        for atomic in (False, True):
+            doc = rst.Document(u("T"))
+            para = rst.Paragraph(u('One'))
+            doc.add_child(para)
+            doc.add_child(rst.Paragraph(u('Two')))
+            self.assertTrue(doc.save(path, atomic=atomic))
+            os.utime(path, (1000, 1000))
+            self.assertFalse(doc.save(path, skip_unchanged=True,
+                                      atomic=atomic))
+            self.assertEqual(os.path.getmtime(path), 1000)
+            para.text = u('Changed')
+            self.assertTrue(doc.save(path, skip_unchanged=True,
+                                     atomic=atomic))
+            with io.open(path, encoding='utf-8') as fobj:
+                self.assertEqual(fobj.read(), doc.get_rst())
+            doc.children.pop()
+            self.assertTrue(doc.save(path, skip_unchanged=True,
+                                     atomic=atomic))
+            with io.open(path, encoding='utf-8') as fobj:
+                self.assertEqual(fobj.read(), doc.get_rst())
+        self.assertEqual(os.listdir(self.tmpdir), ['doc.rst'])
+
+
+    def test_escape(self):
+        "test escaping of inline markup in the text of the nodes"
+        self.assertEqual(rst.escape_text(u('plain text')), u('plain text'))
+        self.assertEqual(rst.escape_text(u('a*b `c` |d| e\\f ..g h..i')),
+                         u('a\\*b \\`c\\` \\|d\\| e\\\\f \\..g h..i'))
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Section(u('*One*'), 2))
+        doc.add_child(rst.Paragraph(u('.. note:: no')))
+        doc.add_child(rst.Paragraph(u('**bold**'), escape=False))
+        blt = rst.Bulletlist()
+        blt.add_item(u('a|b'))
+        doc.add_child(blt)
+        tbl = rst.Table(u('F'), [u('*A*')])
+        tbl.add_item([u('`a`')])
+        doc.add_child(tbl)
+        text = doc.get_rst()
+        actual_text = u('=\nT\n=\n\n\n\\*One\\*\n-------\n\n\\.. note:: no\n\n'
+                        '**bold**\n\n    * a\\|b\n\n.. list-table:: F\n'
+                        '    :header-rows: 1\n\n    * -  \\*A\\*\n'
+                        '    * -  \\`a\\`\n\n')
+        self.assertEqual(text, actual_text)
+        doc = rst.Document(u("*T*"))
+        self.assertEqual(doc.get_rst(), u('=====\n\\*T\\*\n=====\n\n'))
+        doc.escape = False
+        self.assertEqual(doc.get_rst(), u('===\n*T*\n===\n\n'))
+        tbl = rst.Table.from_columns(u('*F*'), [u('A')], [[u('*a*')]],
+                                     escape=False)
+        doc.add_child(tbl)
+        self.assertIn(u('.. list-table:: *F*\n'), doc.get_rst())
+        self.assertIn(u('    * -  *a*\n'), doc.get_rst())
+
+    def test_grid_simple_tables(self):
+        "test grid and simple table formats"
+        doc = rst.Document(u("T"))
+        tbl = rst.Table(u('F'), [u('Name'), u('Project')], format='grid')
+        tbl.add_rows([[u('Ramki'), u('Py\nthon')], [u('Anurag')],
+                      [u(''), u('a|b')]])
+        doc.add_child(tbl)
+        actual_text = u('=\nT\n=\n\n.. table:: F\n\n'
+                        '    +--------+---------+\n'
+                        '    | Name   | Project |\n'
+                        '    +========+=========+\n'
+                        '    | Ramki  | Py thon |\n'
+                        '    +--------+---------+\n'
+                        '    | Anurag |         |\n'
+                        '    +--------+---------+\n'
+                        '    |        | a\\|b    |\n'
+                        '    +--------+---------+\n\n')
+        self.assertEqual(doc.get_rst(), actual_text)
+        tbl.format = 'simple'
+        actual_text = u('=\nT\n=\n\n.. table:: F\n\n'
+                        '    ======  =======\n'
+                        '    Name    Project\n'
+                        '    ======  =======\n'
+                        '    Ramki   Py thon\n'
+                        '    Anurag\n'
+                        '    \\       a\\|b\n'
+                        '    ======  =======\n\n')
+        self.assertEqual(doc.get_rst(), actual_text)
+        self.assertEqual(rst.column_widths([[u('ab'), u('c')],
+                                            [u('d'), u('efg')]]), [2, 3])
+        # wide characters take two columns, rows of = and blank first
+        # cells are escaped in simple tables
+        tbl = rst.Table(u('W'), [u('\u540d'), u('x')])
+        tbl.add_rows([[u('\u4e2d\u6587'), u('e\u0301')], [u('=='), u('==')],
+                      [u(' '), u('b')]])
+        doc = rst.Document(u("T"))
+        doc.add_child(tbl)
+        tbl.format = 'grid'
+        actual_text = u('=\nT\n=\n\n.. table:: W\n\n'
+                        '    +------+----+\n'
+                        '    | \u540d   | x  |\n'
+                        '    +======+====+\n'
+                        '    | \u4e2d\u6587 | e\u0301  |\n'
+                        '    +------+----+\n'
+                        '    | ==   | == |\n'
+                        '    +------+----+\n'
+                        '    |      | b  |\n'
+                        '    +------+----+\n\n')
+        self.assertEqual(doc.get_rst(), actual_text)
+        tbl.format = 'simple'
+        actual_text = u('=\nT\n=\n\n.. table:: W\n\n'
+                        '    ====  ==\n'
+                        '    \u540d    x\n'
+                        '    ====  ==\n'
+                        '    \u4e2d\u6587  e\u0301\n'
+                        '    \\==   ==\n'
+                        '    \\     b\n'
+                        '    ====  ==\n\n')
+        self.assertEqual(doc.get_rst(), actual_text)
+        self.assertEqual(rst.column_width(u('\u4e2d\u6587e\u0301')), 5)
+        path = os.path.join(self.tmpdir, 'friends.csv')
+        with open(path, 'w') as fobj:
+            fobj.write('Name,Project\nRamki,Python\n')
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Table.from_csv(path, u('F'), format='simple'))
+        doc.add_child(rst.Table(u('E'), [u('Name')], format='grid'))
+        actual_text = u('=\nT\n=\n\n.. table:: F\n\n'
+                        '    =====  =======\n'
+                        '    Name   Project\n'
+                        '    =====  =======\n'
+                        '    Ramki  Python\n'
+                        '    =====  =======\n\n'
+                        '.. table:: E\n\n'
+                        '    +------+\n'
+                        '    | Name |\n'
+                        '    +======+\n\n')
+        self.assertEqual(doc.get_rst(), actual_text)
+
+
+    def test_load(self):
+        "test reading a document back"
+        doc = rst.Document(u("My *report*"))
+        doc.add_child(rst.Paragraph(u('Hello |x|\nworld')))
+        sec = rst.Section(u('Part'), 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Paragraph(u('**bold**'), escape=False))
+        sec.add_child(rst.Bulletlist([u('a*b'), u('c')]))
+        sec.add_child(rst.Orderedlist([u('x'), u('y')]))
+        tbl = rst.Table(u('F'), [u('Name'), u('Project')])
+        tbl.add_rows([[u('Ramki'), u('Python')], [u(''), u('Kde')]])
+        sec.add_child(tbl)
+        sec.add_child(rst.CodeBlock(u('import sys\n\nsys.exit(0)'),
+                                    lang='python', linenos=True))
+        sec.add_child(rst.CodeBlock(u('x = 1'), lang='python'))
+        sec.add_child(rst.Paragraph(u('The end')))
+        text = doc.get_rst()
+        new = rst.Document.load(io.StringIO(text))
+        self.assertEqual(new.title, u('My *report*'))
+        self.assertEqual([type(node).__name__ for node in new.children],
+                         ['Paragraph', 'Section', 'Paragraph', 'Bulletlist',
+                          'Orderedlist', 'Table', 'CodeBlock', 'CodeBlock',
+                          'Paragraph'])
+        self.assertEqual(new.children[1].depth, 2)
+        self.assertFalse(new.children[2].escape)
+        self.assertEqual(list(new.children[3].iter_items()),
+                         [u('a*b'), u('c')])
+        self.assertEqual(new.children[5].header, [u('Name'), u('Project')])
+        self.assertEqual(new.children[6].code, u('import sys\n\nsys.exit(0)'))
+        self.assertEqual(new.get_rst(), text)
+        path = os.path.join(self.tmpdir, 'doc.rst')
+        doc.save(path)
+        new = rst.Document.load(path)
+        new.add_child(rst.Paragraph(u('More')))
+        self.assertEqual(new.get_rst(), text + u('More\n\n'))
+        self.assertRaises(ValueError, rst.Document.load,
+                          io.StringIO(u('Not a title\n')))
+        for title, width in ((u('\\*'), u(':widths: 1 1\n')),
+                             (u('*'), u(':widths: 1 1\n    :class: x\n'))):
+            for escape in (True, False):
+                doc = rst.Document(title, escape=escape)
+                tbl = rst.Table(u('F'), [u('A'), u('B')], width)
+                tbl.add_item([u('a'), u('b')])
+                doc.add_child(tbl)
+                text = doc.get_rst()
+                new = rst.Document.load(io.StringIO(text))
+                self.assertEqual(new.children[0].width, width)
+                self.assertEqual(new.get_rst(), text)
+        self.assertEqual(new.title, u('*'))
+
+
+    def test_save_append(self):
+        "test appending the new children of a document to its file"
+        path = os.path.join(self.tmpdir, 'log.rst')
+        doc = rst.Document(u("Log"))
+        doc.add_child(rst.Paragraph(u('One')))
+        self.assertTrue(doc.save(path, append=True))
+        doc.add_child(rst.Section(u('Two'), 2))
+        doc.add_child(rst.Paragraph(u('Three')))
+        doc.save(path, append=True)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), doc.get_rst())
+        # the file is written again from the first changed child on
+        run = rst.Section(u('Run 1'), 2)
+        doc.add_child(run)
+        doc.save(path, append=True)
+        run.add_child(rst.Paragraph(u('step finished')))
+        doc.save(path, append=True)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), doc.get_rst())
+        self.assertTrue(doc.get_rst().endswith(u('step finished\n\n')))
+        doc.children[1].text = u('Changed')
+        doc.add_child(rst.Paragraph(u('Four')))
+        doc.save(path, append=True)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), doc.get_rst())
+        doc.title = u('New log')
+        doc.save(path, append=True)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), doc.get_rst())
+        # a file changed by something else is written again
+        with io.open(path, 'a', encoding='utf-8') as fobj:
+            fobj.write(u('junk'))
+        doc.save(path, append=True)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), doc.get_rst())
+        doc.close()
+        doc = rst.Document(u("Log"), incremental=True)
+        run = rst.Section(u('Run'), 2)
+        doc.add_child(run)
+        doc.add_child(rst.Paragraph(u('One')))
+        doc.save(path, append=True)
+        run.add_child(rst.Bulletlist([u('step')]))
+        doc.save(path, append=True)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), doc.get_rst())
+        self.assertIn(u('* step'), doc.get_rst())
+        self.assertRaises(ValueError, doc.save, path, append=True,
+                          atomic=True)
+        doc.close()
+        self.assertEqual(doc._appends, {})
+
+
+    def test_profile(self):
+        "test render hooks and profiles"
+        doc = rst.Document(u("T"))
+        doc.add_child(rst.Paragraph(u('Some text')))
+        sec = rst.Section(u('Part'), 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Paragraph(u('More')))
+        seen = []
+        hook = rst.add_render_hook(
+            pre=lambda node, depth: seen.append((type(node).__name__, depth)))
+        try:
+            with rst.profile() as prof:
+                doc.get_rst()
+        finally:
+            rst.remove_render_hook(hook)
+        self.assertEqual(seen, [('Paragraph', 1), ('Section', 1),
+                                ('Paragraph', 3)])
+        stats = prof.as_dict()
+        self.assertEqual(stats['Paragraph']['count'], 2)
+        self.assertEqual(stats['Paragraph']['chars'], 17)
+        self.assertEqual(stats['Section']['chars'], 12)
+        self.assertEqual(json.loads(prof.to_json()), stats)
+        self.assertTrue(u('rst_render_nodes_total{type="Section"} 1\n')
+                        in prof.to_prometheus())
+        doc.get_rst()
+        self.assertEqual(prof.as_dict(), stats)
+
+
+    def test_template(self):
+        "test compiling a document with placeholders"
+        doc = rst.Document(u("T"))
+        sec = rst.Section(u('Results'), 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Placeholder('results'))
+        doc.add_child(rst.Placeholder('footer', u('No footer')))
+        template = doc.compile()
+        self.assertEqual(template.names, ['results', 'footer'])
+        tbl = rst.Table(u('R'), [u('A')])
+        tbl.add_item([u('1')])
+        sub = rst.Section(u('More'))
+        sub.add_child(rst.Paragraph(u('*x*')))
+        text = template.fill(results=[tbl, sub])
+        actual_text = u('=\nT\n=\n\n\nResults\n-------\n\n'
+                        '.. list-table:: R\n    :header-rows: 1\n\n'
+                        '    * -  A\n    * -  1\n\n'
+                        '\nMore\n++++\n\n\\*x\\*\n\nNo footer\n\n')
+        self.assertEqual(text, actual_text)
+        self.assertEqual(doc.get_rst(), u('=\nT\n=\n\n\nResults\n-------\n\n'
+                                          'No footer\n\n'))
+        template = pickle.loads(pickle.dumps(template))
+        self.assertEqual(template.fill(results=[tbl, sub]), actual_text)
+        self.assertRaises(KeyError, template.fill, footer=u('x'))
+
+
+    def test_save_split(self):
+        "test saving a document split in many files"
+        doc = rst.Document(u("Book"))
+        doc.add_child(rst.Paragraph(u('Intro')))
+        for i in range(2):
+            chapter = rst.Section(u('Chapter %d') % i, 2)
+            doc.add_child(chapter)
+            chapter.add_child(rst.Paragraph(u('Text %d') % i))
+            for j in range(2):
+                sec = rst.Section(u('Part %d') % j)
+                chapter.add_child(sec)
+                sec.add_child(rst.Paragraph(u('x') * 50))
+        paths = doc.save_split(self.tmpdir, max_bytes=120, workers=2)
+        names = [os.path.basename(path) for path in paths]
+        self.assertEqual(names, ['index.rst', 'chapter-0.rst',
+                                 'chapter-0-part-0.rst',
+                                 'chapter-0-part-1.rst', 'chapter-1.rst',
+                                 'chapter-1-part-0.rst',
+                                 'chapter-1-part-1.rst'])
+        with io.open(paths[0], encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), u(
+                '====\nBook\n====\n\nIntro\n\n.. toctree::\n'
+                '    :maxdepth: 2\n\n    chapter-0\n    chapter-1\n\n'))
+        with io.open(paths[1], encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), u(
+                '\nChapter 0\n---------\n\nText 0\n\n.. toctree::\n'
+                '    :maxdepth: 2\n\n    chapter-0-part-0\n'
+                '    chapter-0-part-1\n\n'))
+        with io.open(paths[2], encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), u('\nPart 0\n++++++\n\n%s\n\n')
+                             % (u('x') * 50))
+        # only the changed file is written again
+        for path in paths:
+            os.utime(path, (0, 0))
+        doc.children[1].children[0].text = u('Changed')
+        self.assertEqual(doc.save_split(self.tmpdir, max_bytes=120), paths)
+        changed = [os.path.basename(path) for path in paths
+                   if os.path.getmtime(path) != 0]
+        self.assertEqual(changed, ['chapter-0.rst'])
+        # without max_bytes the chapters are not split
+        paths = doc.save_split(self.tmpdir)
+        self.assertEqual(len(paths), 3)
+        # max_bytes counts the bytes of the files, not the characters
+        doc = rst.Document(u("Book"))
+        chapter = rst.Section(u('Chapter'), 2)
+        doc.add_child(chapter)
+        sec = rst.Section(u('Part'))
+        chapter.add_child(sec)
+        sec.add_child(rst.Paragraph(u('\xe9') * 100))
+        outdir = os.path.join(self.tmpdir, 'utf8')
+        self.assertEqual(len(doc.save_split(outdir, max_bytes=150)), 3)
+
+
+    @unittest.skipIf(publish_doctree is None, 'docutils is not installed')
+    def test_to_doctree(self):
+        "test building the docutils tree of a document"
+        doc = rst.Document(u("My *report*"))
+        doc.add_child(rst.Paragraph(u('Hello |x|\nworld')))
+        sec = rst.Section(u('Part'), 2)
+        doc.add_child(sec)
+        sec.add_child(rst.Paragraph(u('**bold**'), escape=False))
+        sub = rst.Section(u('*Sub*'), escape=False)
+        sec.add_child(sub)
+        sub.add_child(rst.Bulletlist([u('a*b'), u('c')]))
+        sub.add_child(rst.Orderedlist([u('x'), u('y')]))
+        tbl = rst.Table(u('F'), [u('Name'), u('Project')])
+        tbl.add_rows([[u('Ramki'), u('Python')], [u(''), u('Kde')]])
+        sub.add_child(tbl)
+        doc.add_child(rst.Section(u('End'), 2))
+        doc.add_child(rst.Placeholder('x', u('Default')))
+        expected = publish_doctree(doc.get_rst()).pformat()
+        self.assertEqual(doc.to_doctree().pformat(), expected)
+        doc.escape = False
+        expected = publish_doctree(doc.get_rst()).pformat()
+        self.assertEqual(doc.to_doctree().pformat(), expected)
+        # text the parser still turns into markup is parsed
+        doc = rst.Document(u("See http://example.com"))
+        doc.add_child(rst.Paragraph(u('see http://example.com')))
+        doc.add_child(rst.Paragraph(u('a word_ reference')))
+        doc.add_child(rst.Paragraph(u('Term\n    definition')))
+        doc.add_child(rst.Section(u('Mail me@example.com'), 2))
+        doc.add_child(rst.Bulletlist([u('x'), u('1. y')]))
+        tbl = rst.Table(u('F'), [u('Name')])
+        tbl.add_rows([[u(':field: value')], [u('plain')]])
+        doc.add_child(tbl)
+        expected = publish_doctree(doc.get_rst()).pformat()
+        self.assertIn('reference', expected)
+        self.assertIn('definition_list', expected)
+        self.assertEqual(doc.to_doctree().pformat(), expected)
+        # bullet lists right after each other are one list, also when
+        # their rst is parsed
+        doc = rst.Document(u("Lists"))
+        doc.add_child(rst.Bulletlist([u('a'), u('b')]))
+        doc.add_child(rst.Bulletlist([u('c')]))
+        doc.add_child(rst.Orderedlist([u('x')]))
+        doc.add_child(rst.Orderedlist([u('y')]))
+        doc.add_child(rst.Bulletlist([u('1. z')]))
+        doc.add_child(rst.Bulletlist([u('w')]))
+        doc.add_child(rst.Bulletlist([u('*v*')], escape=False))
+        doc.add_child(rst.Paragraph(u('Text')))
+        doc.add_child(rst.Bulletlist([u('1. u')]))
+        doc.add_child(rst.Orderedlist([u('t')]))
+        expected = publish_doctree(doc.get_rst()).pformat()
+        self.assertEqual(expected.count('bullet_list'), 3)
+        self.assertEqual(doc.to_doctree().pformat(), expected)
+        doc = rst.Document(u("Code"))
+        doc.add_child(rst.CodeBlock(u('x = 1'), lang='python', linenos=True))
+        block = doc.to_doctree().children[-1]
+        self.assertEqual(block.tagname, 'literal_block')
+        self.assertEqual(block['classes'], ['code', 'python'])
+        self.assertEqual(block.astext(), u('1 x = 1'))
+        # the rst of blocks without line numbers parses to the same tree
+        doc = rst.Document(u("Code"))
+        doc.add_child(rst.CodeBlock(u('x = 1'), lang='python'))
+        doc.add_child(rst.CodeBlock(u('y = 2')))
+        doc.add_child(rst.Paragraph(u('The end')))
+        expected = publish_doctree(doc.get_rst()).pformat()
+        self.assertNotIn('system_message', expected)
+        self.assertEqual(doc.to_doctree().pformat(), expected)
+
+
+    def test_max_memory(self):
+        "test spilling the children of a document to disk"
+        def build(doc):
+            for i in range(50):
+                sec = rst.Section(u('Entry \u00e9 %d') % i, 2)
+                doc.add_child(sec)
+                tbl = rst.Table(u('Rows'), [u('Key'), u('Value')])
+                tbl.add_rows([(u('k%d') % j, u('v')) for j in range(10)])
+                sec.add_child(tbl)
+            return doc
+
+        expected = build(rst.Document(u("Audit"))).get_rst()
+        doc = build(rst.Document(u("Audit"), max_memory=4096))
+        self.assertTrue(len(doc.children) < 50)
+        self.assertEqual(doc.get_rst(), expected)
+        self.assertEqual(u('').join(doc.iter_rst()), expected)
+        self.assertIsNone(doc.structure_hash())
+        self.assertRaises(ValueError, doc.compile)
+        self.assertRaises(TypeError, pickle.dumps, doc)
+        path = os.path.join(self.tmpdir, 'audit.rst')
+        doc.save(path)
+        with io.open(path, encoding='utf-8') as fobj:
+            self.assertEqual(fobj.read(), expected)
+        self.assertFalse(doc.save(path, skip_unchanged=True))
+        self.assertRaises(ValueError, doc.save, path, append=True)
+        self.assertRaises(ValueError, doc.save_split, self.tmpdir)
+        doc = build(rst.Document(u("Audit"), incremental=True,
+                                 max_memory=4096))
+        self.assertEqual(doc.get_rst(), expected)
+        doc.add_child(rst.Paragraph(u('End')))
+        self.assertEqual(doc.get_rst(), expected + u('End\n\n'))
+
 
 if __name__ == '__main__':
     unittest.main()